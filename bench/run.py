@@ -0,0 +1,146 @@
+# run.py
+# Load benchmark for LocalHapiClient and HapiCoordinator against simulated
+# devices. Needs the Home Assistant dev requirements; from the repo root:
+#   python -m bench.run --devices 1,10,50,200 --duration 30
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from homeassistant.const import MATCH_ALL
+from homeassistant.core import CoreState, HomeAssistant
+from custom_components.helios2n.client import LocalHapiClient
+from custom_components.helios2n.coordinator import HapiCoordinator
+from custom_components.helios2n.scheduler import HapiScheduler
+from .simulator import SimulatedDevice
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def _monitor_loop(lags, interval=0.01):
+    # how late the loop wakes us up is how long something else blocked it
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lags.append(time.monotonic() - started - interval)
+
+
+async def _wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+async def run_scenario(hass, count, args):
+    devices = [
+        SimulatedDevice(f"SIM-{n:04d}", args.latency, args.error_rate, args.event_rate)
+        for n in range(count)
+    ]
+    for device in devices:
+        await device.start()
+    scheduler = HapiScheduler()
+    latencies = []
+    coordinators = []
+    for device in devices:
+        client = LocalHapiClient(hass, device.host, "bench", "bench")
+        coordinator = HapiCoordinator(hass, client, scheduler)
+
+        def _state_changed(device=device):
+            latencies.append(time.monotonic() - device.last_emitted["InputChanged"])
+
+        coordinator.async_add_listener(_state_changed, ("port", "input1"))
+        coordinators.append(coordinator)
+
+    bus_events = 0
+
+    def _count_event(event):
+        nonlocal bus_events
+        bus_events += 1
+
+    remove_listener = hass.bus.async_listen(MATCH_ALL, _count_event)
+    started = time.monotonic()
+    for coordinator in coordinators:
+        await coordinator.async_start()
+    subscribed = await _wait_for(lambda: all(d.subscriptions for d in devices), args.startup_timeout)
+    startup = time.monotonic() - started
+
+    # steady state only
+    for device in devices:
+        device.requests = 0
+        device.emitted = 0
+    latencies.clear()
+    bus_events = 0
+    lags = []
+    monitor = asyncio.create_task(_monitor_loop(lags))
+    await asyncio.sleep(args.duration)
+    monitor.cancel()
+
+    result = {
+        "devices": count,
+        "all_subscribed": subscribed,
+        "startup_s": round(startup, 2),
+        "events_emitted": sum(d.emitted for d in devices),
+        "bus_events": bus_events,
+        "state_updates": len(latencies),
+        "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "latency_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "latency_max_ms": round(max(latencies, default=0.0) * 1000, 2),
+        "req_per_s_per_device": round(sum(d.requests for d in devices) / count / args.duration, 3),
+        "loop_lag_p99_ms": round(_percentile(lags, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 2),
+        "scheduler": scheduler.stats,
+    }
+
+    remove_listener()
+    for coordinator in coordinators:
+        await coordinator.async_stop()
+        await coordinator.client.close()
+    for device in devices:
+        await device.stop()
+    return result
+
+
+async def _main(args):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.set_state(CoreState.running)
+        results = []
+        for count in args.devices:
+            result = await run_scenario(hass, count, args)
+            results.append(result)
+            if not args.json:
+                print(
+                    f"{result['devices']:>4} devices  startup {result['startup_s']:>6}s  "
+                    f"events {result['events_emitted']:>6}  "
+                    f"latency p50/p99/max {result['latency_p50_ms']}/{result['latency_p99_ms']}/"
+                    f"{result['latency_max_ms']} ms  "
+                    f"{result['req_per_s_per_device']} req/s/device  "
+                    f"loop lag p99/max {result['loop_lag_p99_ms']}/{result['loop_lag_max_ms']} ms"
+                )
+        if args.json:
+            print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="helios2n load benchmark")
+    parser.add_argument("--devices", default="1,10,50",
+                        type=lambda v: [int(n) for n in v.split(",")],
+                        help="comma separated device counts, one scenario each")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per scenario")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated device response time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 responses")
+    parser.add_argument("--event-rate", type=float, default=0.5, help="log events per second per device")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# simulator.py
+# Local stand-in for the 2N HTTP API (HAPI), enough of it to drive
+# LocalHapiClient and HapiCoordinator. Run standalone with
+#   python -m bench.simulator --devices 3
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from aiohttp import web
+
+EVENT_MIX = ("InputChanged", "MotionDetected", "KeyPressed", "CardEntered", "CallStateChanged")
+
+# smallest valid JPEG-ish payload; the client only cares about the bytes
+_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 1024 + b"\xff\xd9"
+
+
+class SimulatedDevice:
+    def __init__(self, serial, latency=0.0, error_rate=0.0, event_rate=0.0,
+                 switches=4, inputs=2, outputs=2, camera=True):
+        self.serial = serial
+        self.latency = latency
+        self.error_rate = error_rate
+        self.event_rate = event_rate
+        self.camera = camera
+        self.switches = {n: {"mode": "monostable" if n == 1 else "bistable", "active": False}
+                         for n in range(1, switches + 1)}
+        self.ports = {f"input{n}": {"type": "input", "state": 0} for n in range(1, inputs + 1)}
+        self.ports.update({f"relay{n}": {"type": "output", "state": 0} for n in range(1, outputs + 1)})
+        self.started = time.monotonic()
+        self._event_ids = itertools.count(1)
+        self._subscription_ids = itertools.count(1)
+        self._subscriptions = {}  # id -> {"events", "wakeup", "expires", "filter"}
+        self.requests = 0
+        self.errors = 0
+        # event type -> monotonic time it was last emitted, for latency measurements
+        self.last_emitted = {}
+        self.emitted = 0
+        self.runner = None
+        self.host = None
+        self._generator = None
+
+    # --- lifecycle
+
+    async def start(self, port=0):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_route("*", "/api/system/info", self._system_info)
+        app.router.add_route("*", "/api/switch/caps", self._switch_caps)
+        app.router.add_route("*", "/api/switch/status", self._switch_status)
+        app.router.add_route("*", "/api/switch/ctrl", self._switch_ctrl)
+        app.router.add_route("*", "/api/io/caps", self._io_caps)
+        app.router.add_route("*", "/api/io/status", self._io_status)
+        app.router.add_route("*", "/api/io/ctrl", self._io_ctrl)
+        app.router.add_route("*", "/api/log/subscribe", self._log_subscribe)
+        app.router.add_route("*", "/api/log/pull", self._log_pull)
+        app.router.add_route("*", "/api/log/unsubscribe", self._log_unsubscribe)
+        app.router.add_route("*", "/api/camera/caps", self._camera_caps)
+        app.router.add_route("*", "/api/camera/snapshot", self._camera_snapshot)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        self.host = f"127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        if self.event_rate:
+            self._generator = asyncio.create_task(self._generate())
+        return self.host
+
+    async def stop(self):
+        if self._generator:
+            self._generator.cancel()
+        for subscription in self._subscriptions.values():
+            subscription["wakeup"].set()
+        if self.runner:
+            await self.runner.cleanup()
+
+    @property
+    def subscriptions(self):
+        return len(self._subscriptions)
+
+    # --- events
+
+    def emit(self, event, params):
+        event_id = next(self._event_ids)
+        now = time.time()
+        entry = {
+            "id": event_id,
+            "tzShift": 0,
+            "utcTime": int(now),
+            "upTime": int(time.monotonic() - self.started),
+            "event": event,
+            "params": params,
+        }
+        self.last_emitted[event] = time.monotonic()
+        self.emitted += 1
+        for subscription in self._subscriptions.values():
+            if not subscription["filter"] or event in subscription["filter"]:
+                subscription["events"].append(entry)
+                subscription["wakeup"].set()
+        return entry
+
+    async def _generate(self):
+        while True:
+            await asyncio.sleep(random.expovariate(self.event_rate))
+            event = random.choice(EVENT_MIX)
+            if event == "InputChanged":
+                port = self.ports["input1"]
+                port["state"] = 1 - port["state"]
+                self.emit(event, {"port": "input1", "state": bool(port["state"])})
+            elif event == "MotionDetected":
+                self.emit(event, {"state": random.choice(("in", "out"))})
+            elif event == "KeyPressed":
+                self.emit(event, {"key": str(random.randint(0, 9))})
+            elif event == "CardEntered":
+                self.emit(event, {"direction": "in", "uid": f"{random.getrandbits(32):08X}", "valid": True})
+            else:
+                self.emit(event, {"direction": "incoming", "state": "ringing", "peer": "sip:100@local"})
+
+    # --- HTTP
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            raise web.HTTPInternalServerError()
+        return await handler(request)
+
+    @staticmethod
+    def _ok(result=None):
+        body = {"success": True}
+        if result is not None:
+            body["result"] = result
+        return web.json_response(body)
+
+    @staticmethod
+    def _error(code, description, param=None):
+        error = {"code": code, "description": description}
+        if param:
+            error["param"] = param
+        return web.json_response({"success": False, "error": error})
+
+    async def _system_info(self, request):
+        return self._ok({
+            "variant": "2N IP Verso (simulated)",
+            "serialNumber": self.serial,
+            "hwVersion": "535v1",
+            "swVersion": "2.39.0.0.0",
+            "buildType": "beta",
+            "deviceName": f"Sim {self.serial}",
+        })
+
+    async def _switch_caps(self, request):
+        return self._ok({"switches": [
+            {"switch": n, "enabled": True, "mode": sw["mode"], "switchOnDuration": 5, "type": "normal"}
+            for n, sw in self.switches.items()
+        ]})
+
+    async def _switch_status(self, request):
+        return self._ok({"switches": [
+            {"switch": n, "active": sw["active"], "locked": False, "held": False}
+            for n, sw in self.switches.items()
+        ]})
+
+    async def _switch_ctrl(self, request):
+        try:
+            switch = self.switches[int(request.query.get("switch", 0))]
+        except (KeyError, ValueError):
+            return self._error(12, "invalid parameter value", "switch")
+        number = int(request.query["switch"])
+        action = request.query.get("action", "on")
+        self._set_switch(number, action in ("on", "trigger"))
+        if action == "trigger":
+            asyncio.get_running_loop().call_later(1, self._set_switch, number, False)
+        return self._ok()
+
+    def _set_switch(self, number, active):
+        switch = self.switches[number]
+        if switch["active"] != active:
+            switch["active"] = active
+            self.emit("SwitchStateChanged", {"switch": number, "state": active})
+
+    async def _io_caps(self, request):
+        return self._ok({"ports": [{"port": name, "type": p["type"]} for name, p in self.ports.items()]})
+
+    async def _io_status(self, request):
+        return self._ok({"ports": [{"port": name, "state": p["state"]} for name, p in self.ports.items()]})
+
+    async def _io_ctrl(self, request):
+        name = request.query.get("port", request.query.get("io"))
+        port = self.ports.get(name)
+        if port is None or port["type"] != "output":
+            return self._error(12, "invalid parameter value", "port")
+        state = 1 if request.query.get("action") == "on" else 0
+        if port["state"] != state:
+            port["state"] = state
+            self.emit("OutputChanged", {"port": name, "state": bool(state)})
+        return self._ok()
+
+    async def _log_subscribe(self, request):
+        self._expire()
+        subscription_id = next(self._subscription_ids)
+        duration = int(request.query.get("duration", 90))
+        event_filter = set(filter(None, request.query.get("filter", "").split(",")))
+        self._subscriptions[subscription_id] = {
+            "events": [],
+            "wakeup": asyncio.Event(),
+            "duration": duration,
+            "expires": time.monotonic() + duration,
+            "filter": event_filter,
+        }
+        return self._ok({"id": subscription_id})
+
+    async def _log_pull(self, request):
+        self._expire()
+        try:
+            subscription = self._subscriptions[int(request.query.get("id", 0))]
+        except (KeyError, ValueError):
+            return self._error(12, "invalid parameter value", "id")
+        timeout = int(request.query.get("timeout", 0))
+        if not subscription["events"] and timeout:
+            subscription["wakeup"].clear()
+            try:
+                await asyncio.wait_for(subscription["wakeup"].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        events, subscription["events"] = subscription["events"], []
+        subscription["expires"] = time.monotonic() + subscription["duration"]
+        return self._ok({"events": events})
+
+    async def _log_unsubscribe(self, request):
+        try:
+            del self._subscriptions[int(request.query.get("id", 0))]
+        except (KeyError, ValueError):
+            return self._error(12, "invalid parameter value", "id")
+        return self._ok()
+
+    def _expire(self):
+        now = time.monotonic()
+        for subscription_id in [i for i, s in self._subscriptions.items() if s["expires"] < now]:
+            del self._subscriptions[subscription_id]
+
+    async def _camera_caps(self, request):
+        if not self.camera:
+            return self._error(1, "function is not supported")
+        return self._ok({
+            "jpegResolution": [
+                {"width": 160, "height": 120},
+                {"width": 320, "height": 240},
+                {"width": 640, "height": 480},
+                {"width": 1280, "height": 960},
+            ],
+            "sources": [{"source": "internal"}],
+        })
+
+    async def _camera_snapshot(self, request):
+        if not self.camera:
+            return self._error(1, "function is not supported")
+        if "width" not in request.query or "height" not in request.query:
+            return self._error(11, "missing mandatory parameter", "width")
+        return web.Response(body=_JPEG, content_type="image/jpeg")
+
+
+async def _serve(args):
+    devices = [
+        SimulatedDevice(f"SIM-{n:04d}", args.latency, args.error_rate, args.event_rate)
+        for n in range(args.devices)
+    ]
+    for n, device in enumerate(devices):
+        await device.start(args.port + n if args.port else 0)
+        print(f"{device.serial} listening on http://{device.host}/api")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for device in devices:
+            await device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated 2N HTTP API devices")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--port", type=int, default=0, help="first port, random ports when 0")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--event-rate", type=float, default=0.5, help="log events per second per device")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
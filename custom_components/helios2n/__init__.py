@@ -1,85 +1,245 @@
+import asyncio
+import os
+import aiohttp
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD
-from .const import DOMAIN, PLATFORMS, DEBUG_ENABLED
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_SSL,
+    CONF_USERNAME,
+    CONF_VERIFY_SSL,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_FINAL_WRITE,
+)
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import slugify
+from .const import (
+    AUTH_BASIC,
+    CONF_AUTH_METHOD,
+    CONF_CAPABILITIES,
+    CONF_SNAPSHOT_EVENTS,
+    CONF_SNAPSHOT_MAX_AGE,
+    CONF_TRACE,
+    DATA_SCHEDULER,
+    DOMAIN,
+    SNAPSHOT_MAX_AGE,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
 from .client import LocalHapiClient
 from .coordinator import HapiCoordinator
-import logging
+from .device import Helios2nDevice
+from .journal import EventJournal
+from .scheduler import HapiScheduler
+from .services import async_setup_services
+from .trace import get_logger, payload
 
-_LOGGER = logging.getLogger(__name__)
+_LOGGER = get_logger(__name__)
 
-def log_debug(msg, *args):
-    if DEBUG_ENABLED:
-        _LOGGER.debug(msg, *args)
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+def _result(response):
+    return response.get("result", {}) if isinstance(response, dict) else {}
+
+def _store(hass, entry):
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}")
+
+def _journal(hass, entry):
+    return EventJournal(hass, hass.config.path(STORAGE_DIR, f"{DOMAIN}.journal.{entry.entry_id}"))
+
+def _snapshot_dir(hass, entry):
+    media = hass.config.media_dirs.get("local", hass.config.path("media"))
+    return os.path.join(media, DOMAIN, slugify(entry.data[CONF_HOST]))
+
+async def _optional(request):
+    # not every device has every API, e.g. Access Units have no camera
+    try:
+        return await request
+    except aiohttp.ClientResponseError as e:
+        _LOGGER.debug("Optional request failed: %s", e)
+        return None
+
+async def async_probe_capabilities(client):
+    # all probes are independent, so a slow link pays for one round trip instead of four
+    info, switch_caps, io_caps, camera_caps = await asyncio.gather(
+        client.system_info(),
+        client.switch_caps(),
+        client.io_caps(),
+        _optional(client.camera_caps()),
+    )
+    _LOGGER.debug("Full system_info response: %s", payload(info))
+    device = Helios2nDevice()
+    device.apply_system_info(_result(info))
+    device.apply_switch_caps(_result(switch_caps))
+    device.apply_io_caps(_result(io_caps))
+    device.apply_camera_caps(_result(camera_caps))
+    _LOGGER.debug("Found switches %s, ports %s", list(device.switches), list(device.ports))
+    return device
+
+async def _async_probe(client):
+    device, switch_status, io_status = await asyncio.gather(
+        async_probe_capabilities(client),
+        client.switch_status(),
+        client.io_status(),
+    )
+    status = {
+        "switches": _result(switch_status).get("switches", []),
+        "ports": _result(io_status).get("ports", []),
+    }
+    return device, status
+
+def platforms_for(device):
+    # restart button and metric sensors exist for every device
+    platforms = ["button", "sensor"]
+    if device.enabled_switches("bistable"):
+        platforms.append("lock")
+    if device.inputs():
+        platforms.append("binary_sensor")
+    if device.outputs():
+        platforms.append("switch")
+    if device.camera:
+        platforms.append("camera")
+    return platforms
+
+def _apply_status(coordinator, status):
+    coordinator.async_set_switch_states(status["switches"])
+    coordinator.async_set_port_states(status["ports"])
+
+async def _async_revalidate(hass, entry, client, coordinator, store, cached):
+    try:
+        # spread revalidation of many devices after a restart
+        async with coordinator.scheduler.slot():
+            device, status = await _async_probe(client)
+    except Exception as e:
+        _LOGGER.warning("Could not revalidate 2N Helios device %s: %s", entry.data.get(CONF_HOST), e)
+        return
+    _apply_status(coordinator, status)
+    capabilities = device.as_dict()
+    if capabilities != cached.as_dict():
+        _LOGGER.debug("Capabilities changed for %s, reloading entry", entry.data.get(CONF_HOST))
+        await store.async_save(capabilities)
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    hass.data.setdefault(DOMAIN, {})[DATA_SCHEDULER] = HapiScheduler()
+    async_setup_services(hass)
+    return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
     _LOGGER.info("Setting up 2N Helios integration for host: %s", entry.data.get(CONF_HOST))
+    _LOGGER.debug("Creating LocalHapiClient...")
+    client = LocalHapiClient(
+        hass=hass,
+        host=entry.data[CONF_HOST],
+        username=entry.data[CONF_USERNAME],
+        password=entry.data[CONF_PASSWORD],
+        use_ssl=entry.data.get(CONF_SSL, False),
+        verify_ssl=entry.data.get(CONF_VERIFY_SSL, False),
+        auth_method=entry.data.get(CONF_AUTH_METHOD, AUTH_BASIC),
+        trace=entry.options.get(CONF_TRACE, False),
+    )
+    _LOGGER.debug("LocalHapiClient created: %s", client)
+    journal = _journal(hass, entry)
+    coordinator = HapiCoordinator(hass, client, hass.data[DOMAIN][DATA_SCHEDULER], journal)
     try:
-        log_debug("Creating LocalHapiClient...")
-        client = LocalHapiClient(
-            hass=hass,
-            host=entry.data[CONF_HOST],
-            username=entry.data[CONF_USERNAME],
-            password=entry.data[CONF_PASSWORD]
-        )
-        log_debug("LocalHapiClient created: %s", client)
-        coordinator = HapiCoordinator(hass, client)
-        log_debug("Starting HapiCoordinator...")
+        await journal.async_load()
+        store = _store(hass, entry)
+        cached = await store.async_load()
+        if cached is None and CONF_CAPABILITIES in entry.data:
+            # probed by the config flow moments ago
+            cached = entry.data[CONF_CAPABILITIES]
+            await store.async_save(cached)
+        if cached is None:
+            _LOGGER.debug("No cached capabilities, probing device...")
+            device, status = await _async_probe(client)
+            await store.async_save(device.as_dict())
+            _apply_status(coordinator, status)
+        else:
+            # build entities from the cache now, refresh state and caps in the background
+            _LOGGER.debug("Using cached capabilities: %s", payload(cached))
+            device = Helios2nDevice.from_dict(cached)
+            entry.async_create_background_task(
+                hass,
+                _async_revalidate(hass, entry, client, coordinator, store, device),
+                f"{DOMAIN} revalidate {entry.data[CONF_HOST]}",
+            )
+        snapshots = None
+        if device.camera:
+            # only devices with a camera pay for the import
+            from .snapshot import SnapshotCache, SnapshotPipeline
+            snapshots = SnapshotCache(
+                client,
+                device.camera,
+                entry.options.get(CONF_SNAPSHOT_MAX_AGE, SNAPSHOT_MAX_AGE),
+            )
+            if entry.options.get(CONF_SNAPSHOT_EVENTS):
+                coordinator.capture = SnapshotPipeline(
+                    hass, snapshots, _snapshot_dir(hass, entry), entry.options[CONF_SNAPSHOT_EVENTS]
+                )
+        _LOGGER.debug("Starting HapiCoordinator...")
         await coordinator.async_start()
-        log_debug("HapiCoordinator started.")
-        info = await client.system_info()
-        log_debug("Full system_info response: %s", info)
-        device_data = await client.switch_status()
-        log_debug("Full switch_status response: %s", device_data)
-        # Use correct keys from API response
-        info_result = info.get("result", {}) if isinstance(info, dict) else {}
-        switch_result = device_data.get("result", {}) if isinstance(device_data, dict) else {}
-        switches = []
-        for sw in switch_result.get("switches", []):
-            # Ensure each switch has id, name, and state
-            switch_id = sw.get("id")
-            switch_name = sw.get("name", f"Relay {sw.get('id', '?')}")
-            switch_state = sw.get("state", "unknown")
-            switches.append({
-                "id": switch_id,
-                "name": switch_name,
-                "state": switch_state
-            })
-            log_debug("Found switch: id=%s, name=%s, state=%s", switch_id, switch_name, switch_state)
-        device_obj = type("Device", (), {
-            "data": type("DeviceData", (), {
-                "serial": info_result.get("serialNumber", "unknown"),
-                "mac": info_result.get("mac", "unknown"),
-                "name": info_result.get("deviceName", "2N Helios"),
-                "model": info_result.get("model", "unknown"),
-                "hardware": info_result.get("hwVersion", "unknown"),
-                "firmware": info_result.get("swVersion", "unknown"),
-                "ports": switches
-            })()
-        })()
-        log_debug("Device object created: %s", device_obj)
+        _LOGGER.debug("HapiCoordinator started.")
+        platforms = platforms_for(device)
+        _LOGGER.debug("Platforms for %s: %s", entry.data[CONF_HOST], platforms)
         hass.data[DOMAIN][entry.entry_id] = {
             "client": client,
             "coordinator": coordinator,
-            "device": device_obj
+            "device": device,
+            "snapshots": snapshots,
+            "platforms": platforms,
+            "options": dict(entry.options),
         }
-        log_debug("Stored client, coordinator, and device in hass.data.")
-        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        _LOGGER.debug("Stored client, coordinator, and device in hass.data.")
+        # the session is ours, make sure it is closed if HA stops without unloading
+        entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, client.close))
+        # entries are not unloaded on shutdown, write the last events and checkpoint
+        entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_FINAL_WRITE, journal.async_stop))
+        entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+        await hass.config_entries.async_forward_entry_setups(entry, platforms)
         _LOGGER.info("2N Helios integration setup complete for host: %s", entry.data.get(CONF_HOST))
         return True
     except Exception as e:
-        _LOGGER.error("Error setting up 2N Helios integration: %s", e, exc_info=True)
-        log_debug("Exception during setup: %s", e)
+        await coordinator.async_stop()
+        await client.close()
+        if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+            # Home Assistant retries with backoff and logs this once, without a traceback
+            raise ConfigEntryNotReady(f"Cannot reach 2N device {entry.data.get(CONF_HOST)}: {e}") from e
+        _LOGGER.error("Error setting up 2N Helios integration for %s: %s", entry.data.get(CONF_HOST), e)
+        _LOGGER.debug("Exception during setup", exc_info=True)
         return False
 
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    data = hass.data[DOMAIN].get(entry.entry_id)
+    options = dict(entry.options)
+    if data is not None:
+        previous = {k: v for k, v in data["options"].items() if k != CONF_TRACE}
+        if previous == {k: v for k, v in options.items() if k != CONF_TRACE}:
+            # tracing is switched on the running client, no reload needed
+            data["client"].trace.enabled = options.get(CONF_TRACE, False)
+            data["options"] = options
+            return
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    log_debug("Unloading entry for host: %s", entry.data.get(CONF_HOST))
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    _LOGGER.debug("Unloading entry for host: %s", entry.data.get(CONF_HOST))
+    platforms = hass.data[DOMAIN].get(entry.entry_id, {}).get("platforms", [])
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, platforms)
     if unload_ok:
         data = hass.data[DOMAIN].pop(entry.entry_id, None)
-        log_debug("Removed data for entry_id: %s", entry.entry_id)
+        _LOGGER.debug("Removed data for entry_id: %s", entry.entry_id)
         if data and "coordinator" in data:
             await data["coordinator"].async_stop()
-            log_debug("Stopped coordinator for entry_id: %s", entry.entry_id)
+            _LOGGER.debug("Stopped coordinator for entry_id: %s", entry.entry_id)
+        if data and "client" in data:
+            await data["client"].close()
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    _LOGGER.debug("Removing cached capabilities and journal for entry_id: %s", entry.entry_id)
+    await _store(hass, entry).async_remove()
+    await _journal(hass, entry).async_remove()
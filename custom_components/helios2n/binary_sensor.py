@@ -1,66 +1,44 @@
-import logging
-
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.const import Platform
 
-from py2n import Py2NDevice
-
-from .const import DOMAIN, DEBUG_ENABLED
+from .const import DOMAIN
+from .device import Helios2nDevice
 from .coordinator import HapiCoordinator
+from .trace import get_logger
 
-_LOGGER = logging.getLogger(__name__)
+_LOGGER = get_logger(__name__)
 PLATFORM = Platform.BINARY_SENSOR
 
-def log_debug(msg, *args):
-    if DEBUG_ENABLED:
-        _LOGGER.debug(msg, *args)
-
 async def async_setup_entry(hass: HomeAssistant, config: ConfigType, async_add_entities: AddEntitiesCallback):
     entry_id = config.entry_id
     data = hass.data[DOMAIN][entry_id]
     device = data["device"]
     coordinator = data["coordinator"]
-    log_debug("Setting up binary sensor entities for entry_id: %s", entry_id)
+    _LOGGER.debug("Setting up binary sensor entities for entry_id: %s", entry_id)
     entities = []
-    for port in getattr(device.data, "ports", []):
-        log_debug("Found port: %s", port)
-        if getattr(port, "type", None) == "input":
-            log_debug("Adding binary sensor entity for port: %s", getattr(port, "id", None))
-            entities.append(Helios2nPortBinarySensorEntity(coordinator, device, getattr(port, "id", None)))
+    for port in device.inputs():
+        _LOGGER.debug("Adding binary sensor entity for port: %s", port.id)
+        entities.append(Helios2nPortBinarySensorEntity(coordinator, device, port.id))
     async_add_entities(entities)
-    log_debug("Added %d binary sensor entities.", len(entities))
+    _LOGGER.debug("Added %d binary sensor entities.", len(entities))
     return True
 
 class Helios2nPortBinarySensorEntity(CoordinatorEntity, BinarySensorEntity):
     _attr_has_entity_name = True
     _attr_entity_registry_enabled_default = False
 
-    def __init__(self, coordinator: HapiCoordinator, device: Py2NDevice, port_id: str) -> None:
-        super().__init__(coordinator)
+    def __init__(self, coordinator: HapiCoordinator, device: Helios2nDevice, port_id: str) -> None:
+        super().__init__(coordinator, ("port", port_id))
         self._device = device
-        self._attr_unique_id = f"{self._device.data.serial}_port_{port_id}"
+        self._attr_device_info = device.device_info
+        self._attr_unique_id = f"{self._device.serial}_port_{port_id}"
         self._attr_name = port_id
         self._port_id = port_id
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            id = self._device.data.serial,
-            identifiers = {(DOMAIN, self._device.data.serial), (DOMAIN, self._device.data.mac)},
-            name= self._device.data.name,
-            manufacturer = "2n/Helios",
-            model = self._device.data.model,
-            hw_version = self._device.data.hardware,
-            sw_version = self._device.data.firmware,
-        )
-
     @property
     def is_on(self) -> bool:
-        for port in self._device.data.ports:
-            if port.id == self._port_id:
-                return port.state
+        return self.coordinator.ports.get(self._port_id)
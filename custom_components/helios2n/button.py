@@ -1,75 +1,57 @@
-import logging
-
-from typing import Any, Coroutine
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.button import ButtonEntity, ButtonDeviceClass
 
-from py2n import Py2NDevice
-
 from .const import DOMAIN
+from .device import Helios2nDevice
+from .coordinator import HapiCoordinator
+from .trace import get_logger
 
-_LOGGER = logging.getLogger(__name__)
+_LOGGER = get_logger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, config: ConfigType, async_add_entities: AddEntitiesCallback):
-    device: Py2NDevice = hass.data[DOMAIN][config.entry_id]
+    data = hass.data[DOMAIN][config.entry_id]
+    device = data["device"]
+    coordinator = data["coordinator"]
     entities = []
-    entities.append(Helios2nRestartButtonEntity(device))
-    for switch in device.data.switches:
-        if switch.enabled and switch.mode == "monostable":
-            entities.append(Helios2nSwitchButtonEntity(device, switch.id))
+    entities.append(Helios2nRestartButtonEntity(coordinator, device))
+    for switch in device.enabled_switches("monostable"):
+        _LOGGER.debug("Adding button entity for switch: %s", switch.id)
+        entities.append(Helios2nSwitchButtonEntity(coordinator, device, switch.id))
     async_add_entities(entities)
     return True
 
-class Helios2nSwitchButtonEntity(ButtonEntity):
+class Helios2nSwitchButtonEntity(CoordinatorEntity, ButtonEntity):
     _attr_has_entity_name = True
     _attr_icon = "mdi:lock-clock"
 
-    def __init__(self, device: Py2NDevice, switch_id: int) -> None:
+    def __init__(self, coordinator: HapiCoordinator, device: Helios2nDevice, switch_id: int) -> None:
+        # no listener context: a button shows no switch state, only availability
+        super().__init__(coordinator)
         self._device = device
-        self._attr_unique_id = f"{self._device.data.serial}_switch_{switch_id}"
+        self._attr_device_info = device.device_info
+        self._attr_unique_id = f"{self._device.serial}_switch_{switch_id}"
         self._attr_name = f"Switch {switch_id}"
         self._switch_id = switch_id
 
-    @property
-    def device_info(self) ->DeviceInfo:
-        return DeviceInfo(
-            id = self._device.data.serial,
-            identifiers = {(DOMAIN, self._device.data.serial), (DOMAIN, self._device.data.mac)},
-            name= self._device.data.name,
-            manufacturer = "2n/Helios",
-            model = self._device.data.model,
-            hw_version = self._device.data.hardware,
-            sw_version = self._device.data.firmware,
-        )
+    async def async_press(self) -> None:
+        # no refresh: the switch state follows from the log stream
+        await self.coordinator.async_switch_ctrl(self._switch_id, "trigger")
 
-    async def async_press(self) -> Coroutine[Any, Any, None]:
-        await self._device.set_switch(self._switch_id, True)
 
-
-class Helios2nRestartButtonEntity(ButtonEntity):
+class Helios2nRestartButtonEntity(CoordinatorEntity, ButtonEntity):
     _attr_has_entity_name = True
     _attr_device_class = ButtonDeviceClass.RESTART
     _attr_entity_registry_visible_default = False
 
-    def __init__(self, device: Py2NDevice) -> None:
+    def __init__(self, coordinator: HapiCoordinator, device: Helios2nDevice) -> None:
+        super().__init__(coordinator)
         self._device = device
-        self._attr_unique_id = f"{self._device.data.serial}_restart"
+        self._attr_device_info = device.device_info
+        self._attr_unique_id = f"{self._device.serial}_restart"
         self._attr_name = "Restart"
 
-    @property
-    def device_info(self) ->DeviceInfo:
-        return DeviceInfo(
-            id = self._device.data.serial,
-            identifiers = {(DOMAIN, self._device.data.serial), (DOMAIN, self._device.data.mac)},
-            name= self._device.data.name,
-            manufacturer = "2n/Helios",
-            model = self._device.data.model,
-            hw_version = self._device.data.hardware,
-            sw_version = self._device.data.firmware,
-        )
-
     async def async_press(self):
-        await self._device.restart()
+        await self.coordinator.client.system_restart()
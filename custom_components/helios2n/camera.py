@@ -0,0 +1,49 @@
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.components.camera import Camera, async_get_still_stream
+from homeassistant.const import Platform
+
+from .const import DOMAIN
+from .device import Helios2nDevice
+from .coordinator import HapiCoordinator
+from .snapshot import SnapshotCache
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+PLATFORM = Platform.CAMERA
+
+async def async_setup_entry(hass: HomeAssistant, config: ConfigType, async_add_entities: AddEntitiesCallback):
+    entry_id = config.entry_id
+    data = hass.data[DOMAIN][entry_id]
+    snapshots = data.get("snapshots")
+    if snapshots is None:
+        _LOGGER.debug("No camera found for entry_id: %s", entry_id)
+        return True
+    async_add_entities([Helios2nCameraEntity(data["coordinator"], data["device"], snapshots)])
+    _LOGGER.debug("Added camera entity for entry_id: %s", entry_id)
+    return True
+
+class Helios2nCameraEntity(CoordinatorEntity, Camera):
+    _attr_has_entity_name = True
+    _attr_name = "Camera"
+    _attr_content_type = "image/jpeg"
+
+    def __init__(self, coordinator: HapiCoordinator, device: Helios2nDevice, snapshots: SnapshotCache) -> None:
+        super().__init__(coordinator)
+        Camera.__init__(self)
+        self._device = device
+        self._attr_device_info = device.device_info
+        self._snapshots = snapshots
+        self._attr_unique_id = f"{self._device.serial}_camera"
+        self._attr_frame_interval = snapshots.max_age
+
+    async def async_camera_image(self, width: int | None = None, height: int | None = None) -> bytes | None:
+        return await self._snapshots.async_get(width, height)
+
+    async def handle_async_mjpeg_stream(self, request):
+        # built from the shared cache, so every stream viewer adds no device load
+        return await async_get_still_stream(
+            request, self._snapshots.async_get, self.content_type, self._snapshots.max_age
+        )
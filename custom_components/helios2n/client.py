@@ -1,79 +1,330 @@
 # client.py
 import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
 import aiohttp
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from .const import DEBUG_ENABLED
-import logging
+from homeassistant.util.json import json_loads
+from homeassistant.util.ssl import get_default_context, get_default_no_verify_context
+from .const import (
+    AUTH_DIGEST,
+    BREAKER_COOLDOWN,
+    BREAKER_MAX_COOLDOWN,
+    BREAKER_THRESHOLD,
+    CONNECTION_LIMIT,
+    DECODE_EXECUTOR_SIZE,
+    KEEPALIVE_TIMEOUT,
+    MAX_RESPONSE_SIZE,
+    READ_CHUNK_SIZE,
+    RESPONSE_CACHE_TTL,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    RETRY_MAX_BACKOFF,
+)
+from .metrics import HapiMetrics
+from .trace import DeviceTrace, get_logger, payload
 
-_LOGGER = logging.getLogger(__name__)
+_LOGGER = get_logger(__name__)
 
-def log_debug(msg, *args):
-    if DEBUG_ENABLED:
-        _LOGGER.debug(msg, *args)
+class DeviceUnavailableError(aiohttp.ClientError):
+    """Raised without contacting the device while its circuit breaker is open."""
+
+class ResponseTooLargeError(aiohttp.ClientError):
+    """Raised when a response body exceeds the client's max_response_size."""
 
 class LocalHapiClient:
-    def __init__(self, hass, host, username, password, timeout=5):
-        self._base = f"http://{host}/api"
-        self._auth = aiohttp.BasicAuth(username, password)
-        self._session = async_get_clientsession(hass)
+    def __init__(self, hass, host, username, password, timeout=5,
+                 use_ssl=False, verify_ssl=False, auth_method=None,
+                 retry_attempts=RETRY_ATTEMPTS, retry_backoff=RETRY_BACKOFF,
+                 retry_max_backoff=RETRY_MAX_BACKOFF, breaker_threshold=BREAKER_THRESHOLD,
+                 breaker_cooldown=BREAKER_COOLDOWN, max_response_size=MAX_RESPONSE_SIZE,
+                 trace=False):
+        self.hass = hass
+        self.host = host
+        self._max_response_size = max_response_size
         self._timeout = aiohttp.ClientTimeout(total=timeout)
-        log_debug("Initialized LocalHapiClient for host: %s", host)
+        if use_ssl:
+            # shared, cached contexts; no blocking certificate loading on the loop
+            ssl_context = get_default_context() if verify_ssl else get_default_no_verify_context()
+        else:
+            ssl_context = False
+        # dedicated pool per device: bounded, kept alive between requests
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT, keepalive_timeout=KEEPALIVE_TIMEOUT, ssl=ssl_context
+        )
+        if auth_method == AUTH_DIGEST:
+            # middlewares need aiohttp 3.12 (Home Assistant 2025.6), basic auth works without
+            auth = {"middlewares": (aiohttp.DigestAuthMiddleware(username, password),)}
+        else:
+            auth = {"auth": aiohttp.BasicAuth(username, password)}
+        self._session = aiohttp.ClientSession(
+            base_url=f"{'https' if use_ssl else 'http'}://{host}",
+            connector=connector,
+            timeout=self._timeout,
+            **auth,
+        )
+        # single-flight GETs: path -> task, and path -> (expiry, result)
+        self._inflight = {}
+        self._cache = {}
+        self._generation = 0
+        self._retry_attempts = max(1, retry_attempts)
+        self._retry_backoff = retry_backoff
+        self._retry_max_backoff = retry_max_backoff
+        # circuit breaker state
+        self.available = True
+        self._failures = 0
+        self._breaker_threshold = breaker_threshold
+        self._breaker_cooldown = breaker_cooldown
+        self._cooldown = breaker_cooldown
+        self._open_until = 0.0
+        self._probing = False
+        self._availability_listeners = []
+        self.metrics = HapiMetrics()
+        # Date header of the latest response, the device's own clock
+        self._date = None
+        self.trace = DeviceTrace(host, trace)
+        _LOGGER.debug("Initialized LocalHapiClient for host: %s", host)
+
+    def add_availability_listener(self, listener):
+        self._availability_listeners.append(listener)
+        return lambda: self._availability_listeners.remove(listener)
+
+    def _set_available(self, available):
+        if self.available == available:
+            return
+        self.available = available
+        if available:
+            _LOGGER.info("2N device %s is available again", self.host)
+        else:
+            _LOGGER.warning("2N device %s is unavailable, retrying in %ss", self.host, self._cooldown)
+        for listener in list(self._availability_listeners):
+            listener()
+
+    def _record_success(self):
+        self._failures = 0
+        self._cooldown = self._breaker_cooldown
+        self._set_available(True)
+
+    def _record_failure(self):
+        self._failures += 1
+        if self.available and self._failures < self._breaker_threshold:
+            return
+        if not self.available:
+            # failed probe, wait longer before the next one
+            self._cooldown = min(self._cooldown * 2, BREAKER_MAX_COOLDOWN)
+        self._open_until = time.monotonic() + self._cooldown
+        if self.available:
+            self.metrics.breaker_trips += 1
+        self._set_available(False)
+
+    async def _check_breaker(self):
+        if self.available:
+            return
+        if self._probing or time.monotonic() < self._open_until:
+            raise DeviceUnavailableError(f"{self.host} is unavailable")
+        # half open: one cheap probe decides whether traffic resumes
+        self._probing = True
+        try:
+            await self._send("GET", "/system/info")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            self._record_failure()
+            raise DeviceUnavailableError(f"{self.host} is unavailable") from ex
+        finally:
+            self._probing = False
+        self._record_success()
+
+    def _backoff(self, attempt):
+        delay = min(self._retry_max_backoff, self._retry_backoff * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def device_time(self):
+        # seconds since the epoch by the device clock, None if it sent no Date header
+        if self._date is None:
+            return None
+        try:
+            return parsedate_to_datetime(self._date).timestamp()
+        except (TypeError, ValueError):
+            return None
 
-    async def _request(self, method, path, **kwargs):
-        url = f"{self._base}{path}"
-        log_debug("Requesting %s %s", method, url)
-        for attempt in (1, 2):  # tiny retry
+    async def close(self, *_):
+        if not self._session.closed:
+            await self._session.close()
+            _LOGGER.debug("Closed LocalHapiClient session for host: %s", self.host)
+
+    async def _send(self, method, path, timeout=None, **kwargs):
+        url = f"/api{path}"
+        _LOGGER.debug("Requesting %s %s", method, url)
+        async with self._session.request(
+            method, url, timeout=timeout or self._timeout, **kwargs
+        ) as r:
+            r.raise_for_status()
+            self._date = r.headers.get("Date")
+            _LOGGER.debug("Response status: %s", r.status)
+            body = await self._read(r)
+            _LOGGER.debug("Response body: %s", payload(body))
+            if not r.headers.get("Content-Type","").startswith("application/json"):
+                return body
+            if len(body) > DECODE_EXECUTOR_SIZE:
+                # a log/pull backlog can be megabytes, don't parse it on the loop
+                return await self.hass.async_add_executor_job(json_loads, body)
+            return json_loads(body)
+
+    async def _read(self, r):
+        limit = self._max_response_size
+        if r.content_length is not None and r.content_length > limit:
+            raise ResponseTooLargeError(f"{r.url} response of {r.content_length} bytes exceeds {limit}")
+        chunks, size = [], 0
+        async for chunk in r.content.iter_chunked(READ_CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                raise ResponseTooLargeError(f"{r.url} response exceeds {limit} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _request(self, method, path, timeout=None, retry_attempts=None, **kwargs):
+        await self._check_breaker()
+        endpoint = path.split("?", 1)[0]
+        attempts = self._retry_attempts if retry_attempts is None else max(1, retry_attempts)
+        for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                self.metrics.retries += 1
+            started = time.monotonic()
             try:
-                async with self._session.request(
-                    method, url, auth=self._auth, timeout=self._timeout, **kwargs
-                ) as r:
-                    r.raise_for_status()
-                    log_debug("Response status: %s", r.status)
-                    if r.headers.get("Content-Type","").startswith("application/json"):
-                        result = await r.json()
-                        log_debug("JSON response: %s", result)
-                        return result
-                    result = await r.read()
-                    log_debug("Raw response: %s", result)
-                    return result
-            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
-                log_debug("Request error on attempt %d: %s", attempt, ex)
-                if attempt == 2:
+                result = await self._send(method, path, timeout, **kwargs)
+            except ResponseTooLargeError:
+                # the device is fine, the same request would return the same body
+                self.metrics.count_error(endpoint)
+                self._record_success()
+                raise
+            except aiohttp.ClientResponseError as ex:
+                self.metrics.count_error(endpoint)
+                if ex.status < 500:
+                    # the device answered, retrying will not change its mind
+                    self._record_success()
                     raise
-                await asyncio.sleep(0.4)
+                error = ex
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                self.metrics.count_error(endpoint)
+                error = ex
+            else:
+                elapsed = time.monotonic() - started
+                self.metrics.observe_request(endpoint, elapsed)
+                self._record_success()
+                if self.trace.enabled:
+                    self.trace.record(
+                        "response", result, method=method, path=path,
+                        params=kwargs.get("params"), elapsed=round(elapsed, 3),
+                    )
+                return result
+            _LOGGER.debug("Request error on attempt %d: %s", attempt, error)
+            if self.trace.enabled:
+                self.trace.record("error", method=method, path=path, attempt=attempt, error=repr(error))
+            # a POST may have acted before the answer got lost (a door trigger, a
+            # restart), it is only repeated when it never reached the device
+            if method != "GET" and not isinstance(error, aiohttp.ClientConnectorError):
+                break
+            if attempt < attempts:
+                await asyncio.sleep(self._backoff(attempt))
+        self._record_failure()
+        raise error
+
+    def invalidate(self, prefix=""):
+        # drop cached and in-flight GETs, an in-flight result is not cached anymore
+        self._generation += 1
+        for path in [p for p in self._cache if p.startswith(prefix)]:
+            del self._cache[path]
+        for path in [p for p in self._inflight if p.startswith(prefix)]:
+            del self._inflight[path]
+
+    def _finish_get(self, path, generation, task):
+        if self._inflight.get(path) is task:
+            del self._inflight[path]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation == self._generation:
+            self._cache[path] = (time.monotonic() + RESPONSE_CACHE_TTL, task.result())
 
-    async def get(self, path):
-        log_debug("GET %s", path)
-        return await self._request("GET", path)
-    async def post(self, path):
-        log_debug("POST %s", path)
-        return await self._request("POST", path)
+    async def get(self, path, **kwargs):
+        _LOGGER.debug("GET %s", path)
+        if kwargs:
+            return await self._request("GET", path, **kwargs)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] > time.monotonic():
+            _LOGGER.debug("GET %s served from cache", path)
+            return cached[1]
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.create_task(self._request("GET", path))
+            task.add_done_callback(lambda t, g=self._generation: self._finish_get(path, g, t))
+            self._inflight[path] = task
+        else:
+            _LOGGER.debug("GET %s joined in-flight request", path)
+        # a cancelled caller must not cancel the request other callers wait on
+        return await asyncio.shield(task)
+    async def post(self, path, **kwargs):
+        _LOGGER.debug("POST %s", path)
+        return await self._request("POST", path, **kwargs)
 
     # HAPI convenience
     async def system_info(self):
-        log_debug("Fetching system_info...")
+        _LOGGER.debug("Fetching system_info...")
         return await self.get("/system/info")
+    async def system_restart(self):
+        _LOGGER.debug("Restarting device...")
+        return await self.post("/system/restart")
     async def switch_status(self):
-        log_debug("Fetching switch_status...")
+        _LOGGER.debug("Fetching switch_status...")
         return await self.get("/switch/status")
+    async def switch_caps(self):
+        _LOGGER.debug("Fetching switch_caps...")
+        return await self.get("/switch/caps")
     async def switch_ctrl(self, n,a):
-        log_debug("Controlling switch: %s, action: %s", n, a)
-        return await self.post(f"/switch/ctrl?switch={n}&action={a}")
+        _LOGGER.debug("Controlling switch: %s, action: %s", n, a)
+        try:
+            return await self.post(f"/switch/ctrl?switch={n}&action={a}")
+        finally:
+            self.invalidate("/switch/")
     async def io_status(self):
-        log_debug("Fetching io_status...")
+        _LOGGER.debug("Fetching io_status...")
         return await self.get("/io/status")
+    async def io_caps(self):
+        _LOGGER.debug("Fetching io_caps...")
+        return await self.get("/io/caps")
     async def io_ctrl(self, i,a):
-        log_debug("Controlling io: %s, action: %s", i, a)
-        return await self.post(f"/io/ctrl?io={i}&action={a}")
-    async def log_subscribe(self):
-        log_debug("Subscribing to log...")
-        return await self.post("/log/subscribe")
-    async def log_pull(self):
-        log_debug("Pulling log...")
-        return await self.post("/log/pull")
-    async def log_unsubscribe(self):
-        log_debug("Unsubscribing from log...")
-        return await self.post("/log/unsubscribe")
-    async def snapshot(self, cam=None):
-        log_debug("Fetching snapshot for camera: %s", cam)
-        return await self.get("/camera/snapshot" + (f"?camera={cam}" if cam else ""))
+        _LOGGER.debug("Controlling io: %s, action: %s", i, a)
+        try:
+            return await self.post(f"/io/ctrl?port={i}&action={a}")
+        finally:
+            self.invalidate("/io/")
+    async def log_subscribe(self, duration=None, include=None, filter=None):
+        _LOGGER.debug("Subscribing to log (include %s, filter %s)...", include, filter)
+        params = {"duration": duration} if duration else {}
+        if include:
+            # "new", "all" or "-<seconds>" to replay recent events
+            params["include"] = include
+        if filter:
+            # comma separated event types, the device drops everything else
+            params["filter"] = filter
+        return await self.post("/log/subscribe", params=params)
+    async def log_pull(self, sub_id, timeout=0):
+        _LOGGER.debug_sampled(20, "Pulling log for subscription %s (timeout %ss)...", sub_id, timeout)
+        # keep the HTTP timeout above the time the device may hold the request open
+        return await self.post(
+            "/log/pull",
+            params={"id": sub_id, "timeout": timeout},
+            timeout=aiohttp.ClientTimeout(total=timeout + self._timeout.total),
+            # retries would outlast the subscription, the pull loop reconnects itself
+            retry_attempts=1,
+        )
+    async def log_unsubscribe(self, sub_id):
+        _LOGGER.debug("Unsubscribing from log...")
+        return await self.post("/log/unsubscribe", params={"id": sub_id})
+    async def camera_caps(self):
+        _LOGGER.debug("Fetching camera_caps...")
+        return await self.get("/camera/caps")
+    async def snapshot(self, cam=None, width=None, height=None):
+        _LOGGER.debug("Fetching snapshot for camera: %s (%sx%s)", cam, width, height)
+        params = {"width": width, "height": height} if width and height else {}
+        if cam:
+            params["camera"] = cam
+        return await self.get("/camera/snapshot", params=params)
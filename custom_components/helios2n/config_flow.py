@@ -1,27 +1,256 @@
 from __future__ import annotations
+import asyncio
+import ipaddress
+import aiohttp
+from aiohttp import hdrs
 from homeassistant import config_entries
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import voluptuous as vol
-from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD
-from .const import DOMAIN
+from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD, CONF_SSL, CONF_VERIFY_SSL
+from . import async_probe_capabilities
+from .client import LocalHapiClient
+from .const import (
+    DOMAIN,
+    CONF_AUTH_METHOD,
+    CONF_CAPABILITIES,
+    CONF_SUBNET,
+    AUTH_BASIC,
+    AUTH_DIGEST,
+    CONF_SNAPSHOT_EVENTS,
+    CONF_SNAPSHOT_MAX_AGE,
+    CONF_TRACE,
+    PROBE_TIMEOUT,
+    SCAN_CONCURRENCY,
+    SCAN_DEVICE_HINTS,
+    SCAN_MAX_HOSTS,
+    SNAPSHOT_EVENT_TYPES,
+    SNAPSHOT_MAX_AGE,
+)
+from .trace import get_logger
 
-DATA_SCHEMA = vol.Schema({
-    vol.Required(CONF_HOST): str,
+_LOGGER = get_logger(__name__)
+
+CREDENTIALS = {
     vol.Required(CONF_USERNAME): str,
     vol.Required(CONF_PASSWORD): str,
-})
+    vol.Optional(CONF_SSL, default=False): bool,
+    vol.Optional(CONF_VERIFY_SSL, default=False): bool,
+    vol.Optional(CONF_AUTH_METHOD, default=AUTH_BASIC): vol.In([AUTH_BASIC, AUTH_DIGEST]),
+}
+
+DATA_SCHEMA = vol.Schema({vol.Required(CONF_HOST): str, **CREDENTIALS})
+
+SCAN_SCHEMA = vol.Schema({vol.Required(CONF_SUBNET): str, **CREDENTIALS})
+
+async def _async_validate(hass, data):
+    # one concurrent capability probe, no retries: returns (device, error key)
+    client = LocalHapiClient(
+        hass=hass,
+        host=data[CONF_HOST],
+        username=data[CONF_USERNAME],
+        password=data[CONF_PASSWORD],
+        timeout=PROBE_TIMEOUT,
+        use_ssl=data.get(CONF_SSL, False),
+        verify_ssl=data.get(CONF_VERIFY_SSL, False),
+        auth_method=data.get(CONF_AUTH_METHOD, AUTH_BASIC),
+        retry_attempts=1,
+    )
+    try:
+        device = await async_probe_capabilities(client)
+    except aiohttp.ClientResponseError as ex:
+        return None, "invalid_auth" if ex.status in (401, 403) else "cannot_connect"
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None, "cannot_connect"
+    finally:
+        await client.close()
+    if device.serial == "unknown":
+        # something answered, but not a 2N device
+        return None, "cannot_connect"
+    return device, None
+
+async def _async_answers(session, url):
+    # cheap first pass of a scan, sent without credentials: is this a 2N device
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT)) as r:
+            server = r.headers.get(hdrs.SERVER, "")
+            if r.status == 401:
+                challenge = r.headers.get(hdrs.WWW_AUTHENTICATE, "")
+                return any(hint in challenge or hint in server for hint in SCAN_DEVICE_HINTS)
+            if r.status != 200:
+                return False
+            try:
+                body = await r.json(content_type=None)
+            except ValueError:
+                return False
+            # HAPI wraps every reply, an error one too, in {"success": ...}
+            return isinstance(body, dict) and "success" in body
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return False
+
+async def _async_scan(hass, network, data, configured):
+    # host -> device for every 2N device in the network that isn't set up yet
+    semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+    # one shared session for the sweep, a full client only for addresses that answer
+    session = async_get_clientsession(hass, verify_ssl=data.get(CONF_VERIFY_SSL, False))
+    scheme = "https" if data.get(CONF_SSL, False) else "http"
+
+    async def probe(host):
+        async with semaphore:
+            if not await _async_answers(session, f"{scheme}://{host}/api/system/info"):
+                return host, None
+            try:
+                device, _ = await _async_validate(hass, {**data, CONF_HOST: host})
+            except Exception as e:
+                _LOGGER.debug("Scanning %s failed: %s", host, e)
+                device = None
+        return host, device
+
+    results = await asyncio.gather(*(probe(str(host)) for host in network.hosts()))
+    return {
+        host: device for host, device in results
+        if device is not None and device.serial not in configured
+    }
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self):
+        self._scan_data = None
+        self._scan_task = None
+        self._found = {}
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return OptionsFlow()
+
     async def async_step_user(self, user_input=None):
-        if user_input is None:
-            return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA)
+        return self.async_show_menu(step_id="user", menu_options=["manual", "scan"])
 
-        # Optional: validate connection here (e.g., call /api/system/info)
+    async def async_step_manual(self, user_input=None):
         errors = {}
-        # if validation fails -> errors["base"] = "cannot_connect"
+        if user_input is not None:
+            try:
+                device, error = await _async_validate(self.hass, user_input)
+            except Exception:
+                _LOGGER.exception("Unexpected error validating %s", user_input[CONF_HOST])
+                device, error = None, "unknown"
+            if error:
+                errors["base"] = error
+            else:
+                await self.async_set_unique_id(device.serial)
+                self._abort_if_unique_id_configured(updates={CONF_HOST: user_input[CONF_HOST]})
+                return self._async_create(user_input, device)
+
+        return self.async_show_form(
+            step_id="manual",
+            data_schema=self.add_suggested_values_to_schema(DATA_SCHEMA, user_input),
+            errors=errors,
+        )
+
+    async def async_step_scan(self, user_input=None):
+        errors = {}
+        if self._scan_task is None and user_input is not None:
+            try:
+                network = ipaddress.ip_network(user_input[CONF_SUBNET], strict=False)
+            except ValueError:
+                errors[CONF_SUBNET] = "invalid_subnet"
+            else:
+                if network.num_addresses > SCAN_MAX_HOSTS:
+                    errors[CONF_SUBNET] = "subnet_too_large"
+            if not errors:
+                self._scan_data = {k: v for k, v in user_input.items() if k != CONF_SUBNET}
+                self._scan_task = self.hass.async_create_task(
+                    _async_scan(self.hass, network, self._scan_data, self._async_current_ids())
+                )
+
+        if self._scan_task is None:
+            return self.async_show_form(
+                step_id="scan",
+                data_schema=self.add_suggested_values_to_schema(SCAN_SCHEMA, user_input),
+                errors=errors,
+            )
+        if not self._scan_task.done():
+            # the flow comes back to this step once the task is done
+            return self.async_show_progress(
+                step_id="scan", progress_action="scan", progress_task=self._scan_task
+            )
+        try:
+            self._found = self._scan_task.result()
+        except Exception:
+            _LOGGER.exception("Unexpected error scanning for 2N devices")
+            self._found = {}
+        self._scan_task = None
+        return self.async_show_progress_done(next_step_id="select" if self._found else "no_devices")
+
+    async def async_step_no_devices(self, user_input=None):
+        return self.async_abort(reason="no_devices_found")
+
+    async def async_step_select(self, user_input=None):
+        if user_input is None:
+            choices = {
+                host: f"{device.name} ({host}, {device.serial})"
+                for host, device in sorted(self._found.items())
+            }
+            schema = vol.Schema({
+                vol.Required(CONF_HOST, default=list(choices)): cv.multi_select(choices),
+            })
+            return self.async_show_form(step_id="select", data_schema=schema)
+
+        hosts = user_input[CONF_HOST]
+        if not hosts:
+            return self.async_abort(reason="no_devices_selected")
+        first, *rest = hosts
+        # every device needs its own entry, this flow can only create one
+        for host in rest:
+            self.hass.async_create_task(
+                self.hass.config_entries.flow.async_init(
+                    DOMAIN,
+                    context={"source": config_entries.SOURCE_IMPORT},
+                    data={
+                        **self._scan_data,
+                        CONF_HOST: host,
+                        CONF_CAPABILITIES: self._found[host].as_dict(),
+                    },
+                )
+            )
+        device = self._found[first]
+        await self.async_set_unique_id(device.serial)
+        self._abort_if_unique_id_configured()
+        return self._async_create({**self._scan_data, CONF_HOST: first}, device)
+
+    async def async_step_import(self, import_data):
+        # devices selected in the same scan, already probed
+        await self.async_set_unique_id(import_data[CONF_CAPABILITIES]["serial"])
+        self._abort_if_unique_id_configured(updates={CONF_HOST: import_data[CONF_HOST]})
+        return self.async_create_entry(title=f"2N @ {import_data[CONF_HOST]}", data=import_data)
+
+    @callback
+    def _async_create(self, data, device):
+        # the first setup uses these capabilities instead of probing again
+        return self.async_create_entry(
+            title=f"2N @ {data[CONF_HOST]}",
+            data={**data, CONF_CAPABILITIES: device.as_dict()},
+        )
+
 
-        if errors:
-            return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA, errors=errors)
+class OptionsFlow(config_entries.OptionsFlow):
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
 
-        return self.async_create_entry(title=f"2N @ {user_input[CONF_HOST]}", data=user_input)
+        options = self.config_entry.options
+        schema = vol.Schema({
+            vol.Optional(
+                CONF_SNAPSHOT_MAX_AGE,
+                default=options.get(CONF_SNAPSHOT_MAX_AGE, SNAPSHOT_MAX_AGE),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=60)),
+            vol.Optional(
+                CONF_SNAPSHOT_EVENTS,
+                default=options.get(CONF_SNAPSHOT_EVENTS, []),
+            ): cv.multi_select(SNAPSHOT_EVENT_TYPES),
+            vol.Optional(CONF_TRACE, default=options.get(CONF_TRACE, False)): bool,
+        })
+        return self.async_show_form(step_id="init", data_schema=schema)
@@ -1,4 +1,145 @@
 """Constants for integration"""
 DOMAIN = "helios2n_hass"
-PLATFORMS = ["switch", "binary_sensor"]  # adjust to what you actually load
-DEBUG_ENABLED = True  # Set to False to disable detailed logs
+
+CONF_AUTH_METHOD = "auth_method"
+AUTH_BASIC = "basic"
+AUTH_DIGEST = "digest"
+
+# the config flow validates a device with one concurrent probe under
+# PROBE_TIMEOUT seconds and stores the result in the entry under
+# CONF_CAPABILITIES. A subnet scan of at most SCAN_MAX_HOSTS addresses probes
+# SCAN_CONCURRENCY hosts at a time.
+CONF_CAPABILITIES = "capabilities"
+CONF_SUBNET = "subnet"
+PROBE_TIMEOUT = 3
+SCAN_MAX_HOSTS = 1024
+SCAN_CONCURRENCY = 64
+# credentials only go to scanned hosts that identify as a 2N device without
+# them: a HAPI reply, or a challenge or server header naming one of these
+SCAN_DEVICE_HINTS = ("2N", "HTTP API", "HIP")
+
+# each device serves only a handful of concurrent HTTP connections, one of
+# which is held open by the log/pull long poll
+CONNECTION_LIMIT = 4
+KEEPALIVE_TIMEOUT = 30
+
+# idempotent GET responses are shared between concurrent callers and reused
+# for this many seconds, unless a ctrl call invalidates them
+RESPONSE_CACHE_TTL = 2
+
+# response bodies are read in chunks and refused past MAX_RESPONSE_SIZE
+# bytes; JSON bodies above DECODE_EXECUTOR_SIZE bytes are decoded in the
+# executor, and logs and traces show at most LOG_PAYLOAD_MAX bytes of a payload
+MAX_RESPONSE_SIZE = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+DECODE_EXECUTOR_SIZE = 64 * 1024
+LOG_PAYLOAD_MAX = 1024
+
+# retry policy: exponential backoff with jitter between attempts
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 5
+
+# circuit breaker: after BREAKER_THRESHOLD failed requests the device is
+# marked unavailable and only probed with system/info, waiting
+# BREAKER_COOLDOWN seconds (doubling up to BREAKER_MAX_COOLDOWN) between probes
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 10
+BREAKER_MAX_COOLDOWN = 300
+
+# camera: one snapshot per resolution is fetched at most every max age
+# seconds and shared by all viewers and the MJPEG stream
+CONF_SNAPSHOT_MAX_AGE = "snapshot_max_age"
+SNAPSHOT_MAX_AGE = 1.0
+SNAPSHOT_DEFAULT_SIZE = (640, 480)
+
+# snapshot on event: events of the selected types wait for a snapshot before
+# they are fired. At most SNAPSHOT_QUEUE_SIZE events wait per device, one
+# capture runs at a time, and the last SNAPSHOT_KEEP images of each device
+# are kept in the media folder.
+CONF_SNAPSHOT_EVENTS = "snapshot_events"
+SNAPSHOT_EVENT_TYPES = [
+    "CallStateChanged",
+    "MotionDetected",
+    "KeyPressed",
+    "CardEntered",
+    "CodeEntered",
+    "DoorStateChanged",
+]
+SNAPSHOT_QUEUE_SIZE = 4
+SNAPSHOT_KEEP = 100
+
+# per config entry cache of the discovered capability model
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.capabilities"
+
+# log/pull long polling: the device holds the request open for up to
+# PULL_TIMEOUT seconds, the subscription expires after SUBSCRIPTION_DURATION
+# seconds without a pull, so it must stay above PULL_TIMEOUT.
+PULL_TIMEOUT = 30
+SUBSCRIPTION_DURATION = 90
+RECONNECT_DELAY = 10
+
+# firmware without long polling answers log/pull at once: pull every
+# POLL_MIN_INTERVAL seconds right after activity, doubling up to
+# POLL_MAX_INTERVAL while quiet. POLL_FALLBACK_AFTER empty pulls in a row
+# that return well before PULL_TIMEOUT switch a device to interval polling.
+POLL_MIN_INTERVAL = 1
+POLL_MAX_INTERVAL = 30
+POLL_FALLBACK_AFTER = 3
+
+# log events entities follow, by listener context kind; the subscription
+# filter carries the ones with listeners plus the typed events automations
+# listen for
+STATE_EVENTS = {
+    "switch": ("SwitchStateChanged",),
+    "port": ("InputChanged", "OutputChanged"),
+}
+
+# per device trace, toggled in the options: the last TRACE_BUFFER_SIZE
+# requests and errors are kept for the diagnostics download
+CONF_TRACE = "trace"
+TRACE_BUFFER_SIZE = 200
+
+# pulled events are handled EVENT_CHUNK_SIZE at a time, yielding to the
+# event loop in between, so a backlog after an outage doesn't stall it
+EVENT_CHUNK_SIZE = 100
+
+# optimistic switch/output state is confirmed by the matching log event,
+# or re-read from the device after CONFIRM_TIMEOUT seconds
+CONFIRM_TIMEOUT = 5
+
+# shared scheduler across all devices: coordinators start SCHEDULER_STAGGER
+# seconds apart and at most SCHEDULER_MAX_CONCURRENCY of them subscribe or
+# process events at the same time
+DATA_SCHEDULER = "scheduler"
+SCHEDULER_MAX_CONCURRENCY = 8
+SCHEDULER_STAGGER = 0.25
+
+# event journal: the last JOURNAL_MAX_EVENTS events per device are kept on
+# disk to deduplicate backfilled events. Writes are batched every
+# JOURNAL_FLUSH_DELAY seconds, pull checkpoints at most every
+# JOURNAL_SYNC_INTERVAL seconds. On resubscribe the device is asked for the
+# events since the last checkpoint, up to JOURNAL_MAX_BACKFILL seconds.
+JOURNAL_MAX_EVENTS = 500
+JOURNAL_FLUSH_DELAY = 5
+JOURNAL_SYNC_INTERVAL = 60
+JOURNAL_MAX_BACKFILL = 24 * 3600
+JOURNAL_BACKFILL_MARGIN = 5
+
+# helios2n_hass.set_switches: switch/output actions running at the same time
+# across all targeted devices
+BULK_MAX_CONCURRENCY = 32
+
+# HAPI error code for "invalid parameter value", returned by log/pull for an
+# unknown or expired subscription id.
+HAPI_ERROR_INVALID_PARAMETER = 12
+
+# HAPI log events are fired as "<DOMAIN>_<snake_case type>", e.g.
+# helios2n_hass_card_entered. Types listed here are aggregated: the first
+# event fires immediately, repeats within the window are collapsed into one
+# trailing event carrying a "count".
+EVENT_DEBOUNCE = {
+    "MotionDetected": 2.0,
+    "NoiseDetected": 2.0,
+}
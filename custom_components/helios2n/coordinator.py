@@ -1,54 +1,437 @@
 # coordinator.py
+import asyncio
 import logging
-from datetime import timedelta
-import async_timeout
-from .const import DEBUG_ENABLED
+import time
+from contextlib import suppress
+import aiohttp
+from .client import ResponseTooLargeError
+from .events import EventDispatcher, hapi_event
+from .const import (
+    CONFIRM_TIMEOUT,
+    DOMAIN,
+    EVENT_CHUNK_SIZE,
+    HAPI_ERROR_INVALID_PARAMETER,
+    JOURNAL_BACKFILL_MARGIN,
+    JOURNAL_MAX_BACKFILL,
+    POLL_FALLBACK_AFTER,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+    PULL_TIMEOUT,
+    RECONNECT_DELAY,
+    STATE_EVENTS,
+    SUBSCRIPTION_DURATION,
+)
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import CoreState, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from .trace import get_logger, payload
 
 
-_LOGGER = logging.getLogger(__name__)
-
-def log_debug(msg, *args):
-    if DEBUG_ENABLED:
-        _LOGGER.debug(msg, *args)
+_LOGGER = get_logger(__name__)
 
 class HapiCoordinator:
-    def __init__(self, hass, client):
+    def __init__(self, hass, client, scheduler, journal=None):
         self.hass = hass
         self.client = client
-        self._cancel = None
-        log_debug("HapiCoordinator initialized.")
+        self.scheduler = scheduler
+        self.journal = journal
+        self._task = None
+        self._subscription_id = None
+        self._subscribed_at = 0
+        # device time the next subscription replays from, when the filter grew
+        self._replay_from = None
+        self.event_filter = None
+        self.recovering = False
+        self._crashed = False
+        # interval polling replaces long polling on firmware that lacks it
+        self.long_poll = True
+        self.poll_interval = POLL_MIN_INTERVAL
+        self._quick_pulls = 0
+        # live state, indexed by switch id and by I/O port name
+        self.switches = {}
+        self.ports = {}
+        # entity callbacks keyed by context, ("switch", id) or ("port", name)
+        self._listeners = {}
+        # optimistic values awaiting their log event: (kind, key) -> cancel timer
+        self._pending = {}
+        self._dispatcher = EventDispatcher(hass, client.host)
+        # optional SnapshotPipeline, set up before async_start
+        self.capture = None
+        # entities follow the client's circuit breaker
+        client.add_availability_listener(self.async_update_listeners)
+        _LOGGER.debug("HapiCoordinator initialized.")
+
+    @property
+    def last_update_success(self):
+        return self.client.available
+
+    @callback
+    def async_add_listener(self, update_callback, context=None):
+        # same contract as DataUpdateCoordinator, so CoordinatorEntity can use it
+        listeners = self._listeners.setdefault(context, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            listeners.remove(update_callback)
+            if not listeners:
+                self._listeners.pop(context, None)
+
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self):
+        for listeners in list(self._listeners.values()):
+            for update_callback in list(listeners):
+                update_callback()
+
+    @callback
+    def _set_state(self, kind, key, value):
+        store = self.switches if kind == "switch" else self.ports
+        if store.get(key) == value:
+            return
+        store[key] = value
+        for update_callback in list(self._listeners.get((kind, key), ())):
+            update_callback()
+
+    @callback
+    def async_set_switch_states(self, switches):
+        # switches as returned in switch/status result
+        for sw in switches:
+            if sw.get("switch") is not None:
+                self._set_state("switch", sw["switch"], bool(sw.get("active")))
+
+    @callback
+    def async_set_port_states(self, ports):
+        # ports as returned in io/status result
+        for port in ports:
+            if port.get("port") is not None:
+                self._set_state("port", port["port"], bool(port.get("state")))
+
+    @callback
+    def _apply_event(self, event):
+        params = event.get("params", {})
+        name = event.get("event")
+        if name == "SwitchStateChanged" and "switch" in params:
+            kind, key = "switch", params["switch"]
+        elif name in ("InputChanged", "OutputChanged") and "port" in params:
+            kind, key = "port", params["port"]
+        else:
+            return
+        # the device has the last word: confirms or rolls back an optimistic value
+        self._cancel_pending(kind, key)
+        self._set_state(kind, key, bool(params.get("state")))
+
+    @callback
+    def _cancel_pending(self, kind, key):
+        cancel = self._pending.pop((kind, key), None)
+        if cancel:
+            cancel()
+
+    @callback
+    def _set_optimistic(self, kind, key, value):
+        self._cancel_pending(kind, key)
+
+        @callback
+        def _expired(_now):
+            self._pending.pop((kind, key), None)
+            _LOGGER.debug("No log event confirmed %s %s, re-reading state", kind, key)
+            self.hass.async_create_task(self._async_reread(kind))
+
+        self._pending[(kind, key)] = async_call_later(self.hass, CONFIRM_TIMEOUT, _expired)
+        self._set_state(kind, key, value)
+
+    @staticmethod
+    def _check_ctrl(response):
+        if isinstance(response, dict) and not response.get("success", True):
+            raise HomeAssistantError(f"2N device rejected the action: {response.get('error')}")
+
+    async def async_switch_ctrl(self, switch_id, action, bistable=False):
+        if action == "trigger" and bistable:
+            # trigger toggles a bistable switch, read before a log event can change it
+            expected = not self.switches.get(switch_id)
+        else:
+            expected = action != "off"
+        self._check_ctrl(await self.client.switch_ctrl(switch_id, action))
+        if action in ("on", "off", "trigger"):
+            self._set_optimistic("switch", switch_id, expected)
+
+    async def async_output_ctrl(self, port, on):
+        self._check_ctrl(await self.client.io_ctrl(port, "on" if on else "off"))
+        self._set_optimistic("port", port, on)
+
+    async def _async_reread(self, kind):
+        try:
+            if kind == "switch":
+                response = await self.client.switch_status()
+                self.async_set_switch_states(response.get("result", {}).get("switches", []))
+            else:
+                response = await self.client.io_status()
+                self.async_set_port_states(response.get("result", {}).get("ports", []))
+        except (aiohttp.ClientError, asyncio.TimeoutError, AttributeError) as ex:
+            _LOGGER.debug("Re-reading %s state failed: %s", kind, ex)
+
+    async def async_request_refresh(self):
+        await asyncio.gather(self._async_reread("switch"), self._async_reread("port"))
 
     async def async_start(self):
-        log_debug("Subscribing to log events...")
-        await self.client.log_subscribe()
-        self._cancel = async_track_time_interval(self.hass, self._pull, timedelta(seconds=3))
-        log_debug("Log subscription started.")
+        # the pull loop subscribes on its first iteration, so setup never waits on it
+        _LOGGER.debug("Starting log event loop...")
+        delay = self.scheduler.register(self)
+        if self.capture:
+            self.capture.async_start(self._dispatcher.async_dispatch)
+        self._task = self.hass.async_create_background_task(
+            self._run(delay), f"{DOMAIN} log pull {self.client.host}"
+        )
+        _LOGGER.debug("Log event loop started.")
 
     async def async_stop(self):
-        log_debug("Unsubscribing from log events...")
-        if self._cancel: self._cancel()
-        await self.client.log_unsubscribe()
-        log_debug("Log subscription stopped.")
-
-    async def _pull(self, now):
-        log_debug("Pulling events from log...")
-        events = await self.client.log_pull() or []
-        log_debug("Events pulled: %s", events)
-        # Handle error response gracefully
-        if isinstance(events, dict) and not events.get("success", True):
-            log_debug("Log pull error: %s", events.get("error"))
+        _LOGGER.debug("Unsubscribing from log events...")
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.scheduler.unregister(self)
+        if self.capture:
+            await self.capture.async_stop()
+        self._dispatcher.async_stop()
+        for cancel in self._pending.values():
+            cancel()
+        self._pending.clear()
+        if self._subscription_id is not None:
+            try:
+                await self.client.log_unsubscribe(self._subscription_id)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                _LOGGER.debug("Log unsubscribe failed: %s", ex)
+            self._subscription_id = None
+        if self.journal:
+            await self.journal.async_stop()
+        _LOGGER.debug("Log subscription stopped.")
+
+    @callback
+    def _event_filter(self):
+        # only event types somebody consumes: enabled entities and listeners on
+        # the typed bus events. Catch-all listeners such as the recorder don't count.
+        kinds = {context[0] for context in self._listeners if context}
+        types = set()
+        for kind, hapi_events in STATE_EVENTS.items():
+            # before the platforms have added their entities, assume all of them
+            if kind in kinds or not kinds:
+                types.update(hapi_events)
+        if self.capture:
+            types.update(self.capture.event_types)
+        for event_type in self.hass.bus.async_listeners():
+            hapi = hapi_event(event_type)
+            if hapi:
+                types.add(hapi)
+        return ",".join(sorted(types))
+
+    async def _async_refilter(self):
+        event_filter = self._event_filter()
+        if event_filter == self.event_filter:
+            return
+        _LOGGER.debug("Event consumers changed, resubscribing with filter %s", event_filter)
+        try:
+            await self.client.log_unsubscribe(self._subscription_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug("Log unsubscribe failed: %s", ex)
+        # events of the added types were filtered out since the old subscription
+        # started, so the next one replays from there; the journal drops the rest
+        added = set(event_filter.split(",")) - set((self.event_filter or "").split(","))
+        if added and self.journal and self._subscribed_at:
+            self._replay_from = self._subscribed_at
+        self._subscription_id = None
+
+    async def _async_wait_started(self):
+        # Automations attach their event triggers when Home Assistant has started.
+        # Subscribing before that would leave their event types out of the filter
+        # and fire the backfill, then checkpoint it, before anyone listens.
+        if self.hass.state is CoreState.running:
+            return
+        started = self.hass.loop.create_future()
+
+        @callback
+        def _started(_hass):
+            if not started.done():
+                started.set_result(None)
+
+        cancel = async_at_started(self.hass, _started)
+        try:
+            await started
+        finally:
+            if not started.done():
+                cancel()
+
+    async def _subscribe(self):
+        # replay what happened since the last complete pull, the journal drops duplicates
+        backfill = self.journal.backfill_seconds() if self.journal else None
+        if self._replay_from is not None:
+            device_time = self.client.device_time()
+            now = device_time if device_time is not None else time.time()
+            since = min(int(now - self._replay_from) + JOURNAL_BACKFILL_MARGIN, JOURNAL_MAX_BACKFILL)
+            backfill = max(backfill or 0, since)
+        self.event_filter = self._event_filter()
+        response = await self.client.log_subscribe(
+            duration=SUBSCRIPTION_DURATION,
+            include=f"-{backfill}" if backfill else None,
+            filter=self.event_filter,
+        )
+        result = response.get("result", {}) if isinstance(response, dict) else {}
+        if result.get("id") is None:
+            raise UpdateFailed(f"Log subscribe failed: {response}")
+        self._subscription_id = result["id"]
+        self._replay_from = None
+        # replays are told apart by the device clock, which may differ from ours
+        device_time = self.client.device_time()
+        self._subscribed_at = int(device_time if device_time is not None else time.time())
+        _LOGGER.debug("Log subscription id: %s", self._subscription_id)
+        self.client.trace.record("subscribe", id=self._subscription_id, filter=self.event_filter, backfill=backfill)
+
+    async def _run(self, delay=0):
+        # Long-poll loop: every pull blocks on the device until events arrive or
+        # PULL_TIMEOUT expires, and the next one is issued as soon as it returns.
+        # Without long polling, pulls are spaced by the adaptive poll_interval.
+        # The start is staggered by the scheduler so devices don't pull in lockstep.
+        await asyncio.sleep(delay)
+        await self._async_wait_started()
+        while True:
+            try:
+                if self._subscription_id is None:
+                    async with self.scheduler.slot(self.recovering):
+                        await self._subscribe()
+                await self._pull()
+                self.recovering = False
+                self._crashed = False
+                if self._subscription_id is not None:
+                    await self._async_refilter()
+                if not self.long_poll:
+                    await asyncio.sleep(self.poll_interval)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpdateFailed) as ex:
+                _LOGGER.debug("Log pull failed, retrying in %ss: %s", RECONNECT_DELAY, ex)
+                if self._subscription_id is not None:
+                    self.client.metrics.subscription_resets += 1
+                self._subscription_id = None
+                self.recovering = True
+                await asyncio.sleep(RECONNECT_DELAY)
+            except Exception:
+                # a garbled body or unexpected payload must not end the loop for good;
+                # the traceback is logged once until a pull succeeds again
+                if self._crashed:
+                    _LOGGER.debug("Log pull failed again, retrying in %ss", RECONNECT_DELAY, exc_info=True)
+                else:
+                    _LOGGER.exception("Unexpected error pulling log events from %s", self.client.host)
+                    self._crashed = True
+                self._subscription_id = None
+                self.recovering = True
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    @callback
+    def _adapt_interval(self, count, elapsed):
+        if self.long_poll:
+            # an empty answer long before the timeout means the device ignores it
+            if count or elapsed >= PULL_TIMEOUT / 2:
+                self._quick_pulls = 0
+                return
+            self._quick_pulls += 1
+            if self._quick_pulls >= POLL_FALLBACK_AFTER:
+                self._fall_back_to_polling()
+        elif count:
+            # tighten right after activity, more is likely to follow
+            self.poll_interval = POLL_MIN_INTERVAL
+        else:
+            self.poll_interval = min(self.poll_interval * 2, POLL_MAX_INTERVAL)
+
+    @callback
+    def _fall_back_to_polling(self):
+        _LOGGER.info("%s does not support log long polling, polling at intervals", self.client.host)
+        self.client.trace.record("fallback", poll_interval=POLL_MIN_INTERVAL)
+        self.long_poll = False
+        self.poll_interval = POLL_MIN_INTERVAL
+
+    async def _pull(self):
+        timeout = PULL_TIMEOUT if self.long_poll else 0
+        started = time.monotonic()
+        try:
+            response = await self.client.log_pull(self._subscription_id, timeout)
+        except ResponseTooLargeError as ex:
+            # the device has handed these events out already, resync the state instead
+            _LOGGER.warning("Dropped oversized log pull from %s: %s", self.client.host, ex)
+            self.hass.async_create_task(self.async_request_refresh())
             return
-        if not isinstance(events, list):
-            log_debug("Events is not a list, skipping event processing.")
+        if not isinstance(response, dict):
+            _LOGGER.debug("Log pull response is not a dict, skipping event processing.")
             return
+        # Handle error response gracefully
+        if not response.get("success", True):
+            error = response.get("error", {})
+            _LOGGER.debug("Log pull error: %s", error)
+            if error.get("code") == HAPI_ERROR_INVALID_PARAMETER and error.get("param") == "timeout":
+                # old firmware rejects the long poll parameter outright
+                self._fall_back_to_polling()
+                return
+            if error.get("code") == HAPI_ERROR_INVALID_PARAMETER:
+                # subscription expired or the device rebooted, subscribe again
+                self.client.metrics.subscription_resets += 1
+                self._subscription_id = None
+                return
+            raise UpdateFailed(f"Log pull error: {error}")
+        events = response.get("result", {}).get("events", [])
+        self._adapt_interval(len(events), time.monotonic() - started)
+        self.scheduler.record_pull(len(events))
+        self.client.metrics.observe_pull(len(events))
+        if events:
+            _LOGGER.debug("Pulled %d events from %s", len(events), self.client.host)
+            backfilled = False
+            async with self.scheduler.slot(self.recovering):
+                for start in range(0, len(events), EVENT_CHUNK_SIZE):
+                    if start:
+                        # let the rest of Home Assistant run between chunks
+                        await asyncio.sleep(0)
+                    backfilled |= self._process(events[start:start + EVENT_CHUNK_SIZE])
+            if backfilled:
+                self.hass.async_create_task(self.async_request_refresh())
+        if self.journal:
+            self.journal.mark_synced()
+
+    @callback
+    def _process(self, events):
+        # returns whether any event was replayed from before the subscription
+        # checked once per chunk, so a quiet logger costs nothing per event
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        event_lag = self.client.metrics.event_lag
+        # lag is measured on the device clock, as of the pull response
+        device_now = self.client.device_time()
+        journal = self.journal
+        capture = self.capture
+        backfilled = False
         for e in events:
-            if isinstance(e, dict):
-                self.hass.bus.async_fire("my2n_event", e)
-                log_debug("Fired event: %s", e)
+            if not isinstance(e, dict):
+                if debug:
+                    _LOGGER.debug("Event is not a dict: %s", e)
+                continue
+            if journal:
+                if not journal.is_new(e):
+                    continue
+                journal.record(e)
+            if e.get("utcTime", self._subscribed_at) < self._subscribed_at:
+                # replayed from before the subscription: fire it, but the current
+                # state is re-read afterwards rather than rebuilt from old events
+                backfilled = True
+                self._dispatcher.async_dispatch({**e, "backfill": True})
             else:
-                log_debug("Event is not a dict: %s", e)
-            # update your sensors here (ring/motion/input)
+                self._apply_event(e)
+                if capture and e.get("event") in capture.event_types:
+                    # fired by the pipeline once the snapshot is stored
+                    capture.submit(e)
+                else:
+                    self._dispatcher.async_dispatch(e)
+                if device_now is not None and "utcTime" in e:
+                    # utcTime has one second resolution, good enough to spot backlog
+                    event_lag.observe(max(0.0, device_now - e["utcTime"]))
+            if debug:
+                _LOGGER.debug("Event %s #%s: %s", e.get("event"), e.get("id"), payload(e.get("params")))
+        return backfilled
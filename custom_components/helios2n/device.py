@@ -0,0 +1,124 @@
+# device.py
+from homeassistant.helpers.device_registry import DeviceInfo
+from .const import DOMAIN
+
+class Switch:
+    __slots__ = ("id", "name", "mode", "enabled")
+
+    def __init__(self, id, name=None, mode=None, enabled=False):
+        self.id = id
+        self.name = name or f"Relay {id}"
+        self.mode = mode
+        self.enabled = enabled
+
+    def as_dict(self):
+        return {"id": self.id, "name": self.name, "mode": self.mode, "enabled": self.enabled}
+
+class Port:
+    __slots__ = ("id", "type")
+
+    def __init__(self, id, type=None):
+        self.id = id
+        self.type = type
+
+    def as_dict(self):
+        return {"id": self.id, "type": self.type}
+
+class Helios2nDevice:
+    # Static capability model of one intercom. Live switch and port state is
+    # kept by HapiCoordinator, indexed by the same switch ids and port names.
+    __slots__ = (
+        "serial", "mac", "name", "model", "hardware", "firmware",
+        "switches", "ports", "camera", "_device_info",
+    )
+
+    def __init__(self, serial="unknown", mac="unknown", name="2N Helios", model="unknown",
+                 hardware="unknown", firmware="unknown"):
+        self.serial = serial
+        self.mac = mac
+        self.name = name
+        self.model = model
+        self.hardware = hardware
+        self.firmware = firmware
+        self.switches = {}  # switch id -> Switch
+        self.ports = {}  # port name -> Port
+        self.camera = ()  # supported (width, height) snapshot resolutions
+        self._device_info = None
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        # built once and shared by all entities of the device, do not modify
+        if self._device_info is None:
+            self._device_info = DeviceInfo(
+                identifiers={(DOMAIN, self.serial)},
+                name=self.name,
+                manufacturer="2N/Helios",
+                model=self.model,
+                hw_version=self.hardware,
+                sw_version=self.firmware,
+            )
+        return self._device_info
+
+    def inputs(self):
+        return [p for p in self.ports.values() if p.type == "input"]
+
+    def outputs(self):
+        return [p for p in self.ports.values() if p.type == "output"]
+
+    def enabled_switches(self, mode):
+        return [sw for sw in self.switches.values() if sw.enabled and sw.mode == mode]
+
+    # incremental updates from parsed HAPI results
+
+    def apply_system_info(self, result):
+        self.serial = result.get("serialNumber", self.serial)
+        self.mac = result.get("mac", self.mac)
+        self.name = result.get("deviceName", self.name)
+        self.model = result.get("model", self.model)
+        self.hardware = result.get("hwVersion", self.hardware)
+        self.firmware = result.get("swVersion", self.firmware)
+        self._device_info = None
+
+    def apply_switch_caps(self, result):
+        self.switches = {
+            sw["switch"]: Switch(sw["switch"], mode=sw.get("mode"), enabled=sw.get("enabled", False))
+            for sw in result.get("switches", []) if sw.get("switch") is not None
+        }
+
+    def apply_io_caps(self, result):
+        self.ports = {
+            port["port"]: Port(port["port"], port.get("type"))
+            for port in result.get("ports", []) if port.get("port") is not None
+        }
+
+    def apply_camera_caps(self, result):
+        self.camera = tuple(
+            (r["width"], r["height"]) for r in result.get("jpegResolution", [])
+            if r.get("width") and r.get("height")
+        )
+
+    # persisted form, see STORAGE_KEY
+
+    def as_dict(self):
+        return {
+            "serial": self.serial,
+            "mac": self.mac,
+            "name": self.name,
+            "model": self.model,
+            "hardware": self.hardware,
+            "firmware": self.firmware,
+            "switches": [sw.as_dict() for sw in self.switches.values()],
+            "ports": [port.as_dict() for port in self.ports.values()],
+            "camera": [{"width": w, "height": h} for w, h in self.camera],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        device = cls(
+            data.get("serial", "unknown"), data.get("mac", "unknown"), data.get("name", "2N Helios"),
+            data.get("model", "unknown"), data.get("hardware", "unknown"), data.get("firmware", "unknown"),
+        )
+        device.switches = {sw["id"]: Switch(**sw) for sw in data.get("switches", [])}
+        device.ports = {port["id"]: Port(**port) for port in data.get("ports", [])}
+        device.camera = tuple((r["width"], r["height"]) for r in data.get("camera", []))
+        return device
@@ -0,0 +1,46 @@
+# diagnostics.py
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from .const import DATA_SCHEDULER, DOMAIN
+
+TO_REDACT = {CONF_HOST, CONF_PASSWORD, CONF_USERNAME, "serial", "mac"}
+
+def _redact_trace(records, secrets):
+    # trace payloads are bounded reprs, so the identifiers are replaced in the text
+    secrets = [s for s in secrets if s and s != "unknown"]
+    redacted = []
+    for record in async_redact_data(records, TO_REDACT):
+        for key, value in record.items():
+            if isinstance(value, str):
+                for secret in secrets:
+                    value = value.replace(secret, REDACTED)
+                record[key] = value
+        redacted.append(record)
+    return redacted
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    data = hass.data[DOMAIN][entry.entry_id]
+    client = data["client"]
+    coordinator = data["coordinator"]
+    device = data["device"]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": dict(entry.options),
+        "device": async_redact_data(device.as_dict(), TO_REDACT),
+        "available": client.available,
+        "state": {
+            "switches": dict(coordinator.switches),
+            "ports": dict(coordinator.ports),
+        },
+        "subscription": {
+            "filter": coordinator.event_filter,
+            "long_poll": coordinator.long_poll,
+            "poll_interval": coordinator.poll_interval,
+        },
+        "metrics": client.metrics.as_dict(),
+        "scheduler": hass.data[DOMAIN][DATA_SCHEDULER].stats,
+        "snapshot_events": coordinator.capture.as_dict() if coordinator.capture else None,
+        "trace": _redact_trace(client.trace.as_list(), (client.host, device.serial, device.mac)),
+    }
@@ -0,0 +1,73 @@
+# events.py
+import re
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from .const import DOMAIN, EVENT_DEBOUNCE
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+
+_EVENT_NAMES = {}
+
+def event_name(hapi_event):
+    # CardEntered -> helios2n_hass_card_entered, cached since the set of types is small
+    name = _EVENT_NAMES.get(hapi_event)
+    if name is None:
+        name = f"{DOMAIN}_{re.sub(r'(?<!^)(?=[A-Z])', '_', hapi_event).lower()}"
+        _EVENT_NAMES[hapi_event] = name
+    return name
+
+def hapi_event(name):
+    # helios2n_hass_card_entered -> CardEntered, None for other domains
+    prefix = f"{DOMAIN}_"
+    if not isinstance(name, str) or not name.startswith(prefix):
+        return None
+    return "".join(part.capitalize() for part in name[len(prefix):].split("_"))
+
+class EventDispatcher:
+    def __init__(self, hass, host, debounce=None):
+        self.hass = hass
+        self.host = host
+        self._debounce = EVENT_DEBOUNCE if debounce is None else debounce
+        # event type -> [suppressed count, last suppressed event, cancel timer]
+        self._pending = {}
+
+    @callback
+    def async_dispatch(self, event):
+        hapi_event = event.get("event", "Unknown")
+        window = self._debounce.get(hapi_event)
+        if not window:
+            self._fire(hapi_event, event, 1)
+            return
+        pending = self._pending.get(hapi_event)
+        if pending is None:
+            self._fire(hapi_event, event, 1)
+            self._open_window(hapi_event, window)
+        else:
+            pending[0] += 1
+            pending[1] = event
+
+    @callback
+    def async_stop(self):
+        for _, _, cancel in self._pending.values():
+            cancel()
+        self._pending.clear()
+
+    @callback
+    def _open_window(self, hapi_event, window):
+        @callback
+        def _flush(_now):
+            count, event, _ = self._pending.pop(hapi_event)
+            if count:
+                self._fire(hapi_event, event, count)
+                # still busy, keep aggregating
+                self._open_window(hapi_event, window)
+
+        self._pending[hapi_event] = [0, None, async_call_later(self.hass, window, _flush)]
+
+    @callback
+    def _fire(self, hapi_event, event, count):
+        data = {**event, "host": self.host}
+        if count > 1:
+            data["count"] = count
+        self.hass.bus.async_fire(event_name(hapi_event), data)
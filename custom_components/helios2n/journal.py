@@ -0,0 +1,149 @@
+# journal.py
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from .const import (
+    JOURNAL_BACKFILL_MARGIN,
+    JOURNAL_FLUSH_DELAY,
+    JOURNAL_MAX_BACKFILL,
+    JOURNAL_MAX_EVENTS,
+    JOURNAL_SYNC_INTERVAL,
+)
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+
+class EventJournal:
+    # Append-only JSON lines file per device with the last seen events and
+    # "synced" checkpoints (the last time a pull was known to be complete).
+    # Writes are buffered and batched to the executor, the pull path only
+    # touches memory.
+    def __init__(self, hass, path, max_events=JOURNAL_MAX_EVENTS):
+        self.hass = hass
+        self._path = path
+        self._max_events = max_events
+        self._recent = deque()  # (id, utcTime) in arrival order
+        self._recent_keys = set()
+        self.synced_at = None
+        self._synced_written = 0.0
+        self._buffer = []
+        self._lines = 0
+        self._cancel_flush = None
+        self._lock = asyncio.Lock()
+
+    async def async_load(self):
+        records = await self.hass.async_add_executor_job(self._read)
+        for record in records:
+            if "synced" in record:
+                self.synced_at = max(self.synced_at or 0, record["synced"])
+            else:
+                self._remember((record.get("id"), record.get("utcTime")))
+        _LOGGER.debug("Loaded journal %s: %d events, synced at %s", self._path, len(self._recent), self.synced_at)
+
+    def backfill_seconds(self):
+        # how far back to ask the device on subscribe, None without a checkpoint
+        if self.synced_at is None:
+            return None
+        gap = int(time.time() - self.synced_at) + JOURNAL_BACKFILL_MARGIN
+        return min(max(gap, 0), JOURNAL_MAX_BACKFILL)
+
+    def is_new(self, event):
+        # exact matches only, the device clock may go backwards
+        return (event.get("id"), event.get("utcTime")) not in self._recent_keys
+
+    @callback
+    def record(self, event):
+        key = (event.get("id"), event.get("utcTime"))
+        self._remember(key)
+        self._buffer.append({"id": key[0], "utcTime": key[1], "event": event.get("event")})
+        self._schedule_flush()
+
+    @callback
+    def mark_synced(self):
+        self.synced_at = time.time()
+        if self.synced_at - self._synced_written >= JOURNAL_SYNC_INTERVAL:
+            self._synced_written = self.synced_at
+            self._buffer.append({"synced": self.synced_at})
+            self._schedule_flush()
+
+    async def async_stop(self, *_):
+        # final checkpoint and flush, also on the way out when HA stops
+        if self._cancel_flush:
+            self._cancel_flush()
+            self._cancel_flush = None
+        if self.synced_at is not None:
+            self._buffer.append({"synced": self.synced_at})
+        await self.async_flush()
+
+    async def async_flush(self):
+        async with self._lock:
+            records, self._buffer = self._buffer, []
+            if records:
+                await self.hass.async_add_executor_job(self._write, records)
+
+    async def async_remove(self):
+        await self.hass.async_add_executor_job(self._remove)
+
+    def _remember(self, key):
+        if key in self._recent_keys:
+            return
+        self._recent.append(key)
+        self._recent_keys.add(key)
+        if len(self._recent) > self._max_events:
+            self._recent_keys.discard(self._recent.popleft())
+
+    @callback
+    def _schedule_flush(self):
+        if self._cancel_flush is not None:
+            return
+
+        @callback
+        def _flush(_now):
+            self._cancel_flush = None
+            self.hass.async_create_task(self.async_flush())
+
+        self._cancel_flush = async_call_later(self.hass, JOURNAL_FLUSH_DELAY, _flush)
+
+    # executor side
+
+    def _read(self):
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        self._lines = len(lines)
+        records = []
+        for line in lines[-self._max_events:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # torn last line after a crash
+                continue
+        return records
+
+    def _write(self, records):
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        self._lines += len(records)
+        if self._lines > 2 * self._max_events:
+            self._compact()
+
+    def _compact(self):
+        with open(self._path, encoding="utf-8") as f:
+            lines = f.readlines()[-self._max_events:]
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, self._path)
+        self._lines = len(lines)
+
+    def _remove(self):
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
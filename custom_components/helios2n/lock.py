@@ -1,63 +1,47 @@
-import logging
-
-from typing import Any, Coroutine
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.lock import LockEntity
 from homeassistant.const import Platform
 
-from py2n import Py2NDevice
-
 from .const import DOMAIN
-from .coordinator import Helios2nSwitchDataUpdateCoordinator
+from .device import Helios2nDevice
+from .coordinator import HapiCoordinator
+from .trace import get_logger
 
-_LOGGER = logging.getLogger(__name__)
+_LOGGER = get_logger(__name__)
 PLATFORM = Platform.LOCK
 
 async def async_setup_entry(hass: HomeAssistant, config: ConfigType, async_add_entities: AddEntitiesCallback):
-    device: Py2NDevice = hass.data[DOMAIN][config.entry_id]
-    coordinator: Helios2nSwitchDataUpdateCoordinator = hass.data[DOMAIN][PLATFORM]["coordinator"]
+    data = hass.data[DOMAIN][config.entry_id]
+    device = data["device"]
+    coordinator = data["coordinator"]
     entities = []
-    for switch in device.data.switches:
-        if switch.enabled and switch.mode == "bistable":
-            entities.append(Helios2nLockEntity(coordinator, device, switch.id))
+    for switch in device.enabled_switches("bistable"):
+        _LOGGER.debug("Adding lock entity for switch: %s", switch.id)
+        entities.append(Helios2nLockEntity(coordinator, device, switch.id))
     async_add_entities(entities)
     return True
 
 class Helios2nLockEntity(CoordinatorEntity, LockEntity):
     _attr_has_entity_name = True
-    _attr_should_poll = True
 
-    def __init__(self, coordinator: Helios2nSwitchDataUpdateCoordinator, device: Py2NDevice, switch_id: int) -> None:
-        super().__init__(coordinator)
+    def __init__(self, coordinator: HapiCoordinator, device: Helios2nDevice, switch_id: int) -> None:
+        super().__init__(coordinator, ("switch", switch_id))
         self._device = device
-        self._attr_unique_id = f"{self._device.data.serial}_switch_{switch_id}"
+        self._attr_device_info = device.device_info
+        self._attr_unique_id = f"{self._device.serial}_switch_{switch_id}"
         self._attr_name = f"Switch {switch_id}"
         self._switch_id = switch_id
 
     @property
-    def device_info(self) ->DeviceInfo:
-        return DeviceInfo(
-            id = self._device.data.serial,
-            identifiers = {(DOMAIN, self._device.data.serial), (DOMAIN, self._device.data.mac)},
-            name= self._device.data.name,
-            manufacturer = "2n/Helios",
-            model = self._device.data.model,
-            hw_version = self._device.data.hardware,
-            sw_version = self._device.data.firmware,
-        )
-
-    @property
-    def is_locked(self) -> bool:
-        return not self._device.get_switch(self._switch_id)
+    def is_locked(self) -> bool | None:
+        active = self.coordinator.switches.get(self._switch_id)
+        return None if active is None else not active
 
-    async def async_unlock(self, **kwargs) -> Coroutine[Any, Any, None]:
-        await self._device.set_switch(self._switch_id, True)
-        await self.coordinator.async_request_refresh()
+    async def async_unlock(self, **kwargs) -> None:
+        await self.coordinator.async_switch_ctrl(self._switch_id, "on")
 
-    async def async_lock(self, **kwargs) -> Coroutine[Any, Any, None]:
-        await self._device.set_switch(self._switch_id, False)
-        await self.coordinator.async_request_refresh()
+    async def async_lock(self, **kwargs) -> None:
+        await self.coordinator.async_switch_ctrl(self._switch_id, "off")
@@ -0,0 +1,92 @@
+# metrics.py
+from bisect import bisect_left
+
+# upper bounds in seconds (latency, lag) or events (pull sizes), last bucket is +inf
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 30.0, 300.0)
+PULL_BUCKETS = (1, 5, 10, 50, 100, 500)
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {"count": self.count, "sum": self.total, "avg": self.avg, "max": self.max, "buckets": buckets}
+
+class HapiMetrics:
+    # Plain counters and fixed-bucket histograms: recording is a few integer
+    # increments, so this stays on in production.
+    def __init__(self):
+        self.requests = {}  # endpoint -> latency Histogram
+        self.errors = {}  # endpoint -> count
+        self.retries = 0
+        self.breaker_trips = 0
+        self.pulls = 0
+        self.events = 0
+        self.events_per_pull = Histogram(PULL_BUCKETS)
+        self.event_lag = Histogram(LAG_BUCKETS)
+        self.subscription_resets = 0
+
+    def observe_request(self, endpoint, seconds):
+        histogram = self.requests.get(endpoint)
+        if histogram is None:
+            histogram = self.requests[endpoint] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def count_error(self, endpoint):
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def observe_pull(self, events):
+        self.pulls += 1
+        self.events += events
+        if events:
+            self.events_per_pull.observe(events)
+
+    @property
+    def request_count(self):
+        return sum(h.count for h in self.requests.values())
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    def request_latency_avg(self, exclude=("/log/pull",)):
+        # the long poll waits for events on purpose, so it would drown out the rest
+        count = total = 0
+        for endpoint, histogram in self.requests.items():
+            if endpoint not in exclude:
+                count += histogram.count
+                total += histogram.total
+        return total / count if count else None
+
+    def as_dict(self):
+        return {
+            "requests": {endpoint: h.as_dict() for endpoint, h in self.requests.items()},
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "breaker_trips": self.breaker_trips,
+            "pulls": self.pulls,
+            "events": self.events,
+            "events_per_pull": self.events_per_pull.as_dict(),
+            "event_lag": self.event_lag.as_dict(),
+            "subscription_resets": self.subscription_resets,
+        }
@@ -0,0 +1,98 @@
+# scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from .const import SCHEDULER_MAX_CONCURRENCY, SCHEDULER_STAGGER
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+
+PRIORITY_HEALTHY = 0
+PRIORITY_RECOVERING = 1
+
+class HapiScheduler:
+    # Shared by all config entries: staggers coordinator start-up and caps how
+    # many devices subscribe or process events at once, healthy ones first.
+    def __init__(self, max_concurrency=SCHEDULER_MAX_CONCURRENCY, stagger=SCHEDULER_STAGGER):
+        self._max_concurrency = max_concurrency
+        self._stagger = stagger
+        self._active = 0
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._next_start = 0.0
+        self._coordinators = set()
+        self._granted = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._pulls = 0
+        self._events = 0
+
+    def register(self, coordinator):
+        # returns how long the coordinator should wait before its first subscribe
+        self._coordinators.add(coordinator)
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self._stagger
+        _LOGGER.debug("Scheduled %s to start in %.2fs", coordinator.client.host, start - now)
+        return start - now
+
+    def unregister(self, coordinator):
+        self._coordinators.discard(coordinator)
+
+    def record_pull(self, events):
+        self._pulls += 1
+        self._events += events
+
+    @asynccontextmanager
+    async def slot(self, recovering=False):
+        started = time.monotonic()
+        if self._active < self._max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            priority = PRIORITY_RECOVERING if recovering else PRIORITY_HEALTHY
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            try:
+                # _release hands its slot over, _active stays the same
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+                raise
+        waited = time.monotonic() - started
+        self._granted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @property
+    def stats(self):
+        recovering = sum(1 for c in self._coordinators if c.recovering)
+        return {
+            "devices": len(self._coordinators),
+            "healthy": len(self._coordinators) - recovering,
+            "recovering": recovering,
+            "max_concurrency": self._max_concurrency,
+            "active": self._active,
+            "queued": sum(1 for _, _, f in self._waiters if not f.done()),
+            "granted": self._granted,
+            "wait_avg": self._wait_total / self._granted if self._granted else 0.0,
+            "wait_max": self._wait_max,
+            "pulls": self._pulls,
+            "events": self._events,
+        }
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import Platform, UnitOfTime
+
+from .const import DOMAIN
+from .device import Helios2nDevice
+from .metrics import HapiMetrics
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+PLATFORM = Platform.SENSOR
+# metrics change with every request, read them once a minute instead
+SCAN_INTERVAL = timedelta(seconds=60)
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+# key, name, unit, state class, value
+METRIC_SENSORS = (
+    ("request_latency", "Request latency", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda m: _ms(m.request_latency_avg())),
+    ("requests", "Requests", None, SensorStateClass.TOTAL_INCREASING, lambda m: m.request_count),
+    ("request_errors", "Request errors", None, SensorStateClass.TOTAL_INCREASING, lambda m: m.error_count),
+    ("request_retries", "Request retries", None, SensorStateClass.TOTAL_INCREASING, lambda m: m.retries),
+    ("events", "Events", None, SensorStateClass.TOTAL_INCREASING, lambda m: m.events),
+    ("events_per_pull", "Events per pull", None, SensorStateClass.MEASUREMENT,
+     lambda m: round(m.events_per_pull.avg, 1) if m.events_per_pull.avg is not None else None),
+    ("event_lag", "Event lag", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda m: _ms(m.event_lag.avg)),
+    ("subscription_resets", "Subscription resets", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.subscription_resets),
+)
+
+async def async_setup_entry(hass: HomeAssistant, config: ConfigType, async_add_entities: AddEntitiesCallback):
+    entry_id = config.entry_id
+    data = hass.data[DOMAIN][entry_id]
+    device = data["device"]
+    metrics = data["client"].metrics
+    _LOGGER.debug("Setting up metric sensor entities for entry_id: %s", entry_id)
+    async_add_entities(
+        Helios2nMetricSensorEntity(device, metrics, *description) for description in METRIC_SENSORS
+    )
+    return True
+
+class Helios2nMetricSensorEntity(SensorEntity):
+    _attr_has_entity_name = True
+    _attr_entity_registry_enabled_default = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, device: Helios2nDevice, metrics: HapiMetrics, key, name, unit, state_class, value_fn) -> None:
+        self._device = device
+        self._attr_device_info = device.device_info
+        self._metrics = metrics
+        self._value_fn = value_fn
+        self._attr_unique_id = f"{self._device.serial}_metric_{key}"
+        self._attr_name = name
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    async def async_update(self) -> None:
+        self._attr_native_value = self._value_fn(self._metrics)
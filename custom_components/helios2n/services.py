@@ -0,0 +1,94 @@
+# services.py
+import asyncio
+import time
+import voluptuous as vol
+from homeassistant.const import ATTR_DEVICE_ID
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+import aiohttp
+from .const import BULK_MAX_CONCURRENCY, DATA_SCHEDULER, DOMAIN
+
+SERVICE_SCHEDULER_STATS = "scheduler_stats"
+SERVICE_SET_SWITCHES = "set_switches"
+
+ATTR_SWITCHES = "switches"
+ATTR_OUTPUTS = "outputs"
+ATTR_ACTION = "action"
+
+SET_SWITCHES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_SWITCHES): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+    vol.Optional(ATTR_OUTPUTS): vol.All(cv.ensure_list, [cv.string]),
+    vol.Required(ATTR_ACTION): vol.In(["on", "off", "trigger"]),
+})
+
+def _entry_data(hass, device_id):
+    device = dr.async_get(hass).async_get(device_id)
+    if device is not None:
+        for entry_id in device.config_entries:
+            if entry_id in hass.data[DOMAIN] and entry_id != DATA_SCHEDULER:
+                return hass.data[DOMAIN][entry_id]
+    raise ServiceValidationError(f"{device_id} is not a loaded 2N device")
+
+async def _timed(semaphore, coro):
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            await coro
+        except (aiohttp.ClientError, asyncio.TimeoutError, HomeAssistantError) as ex:
+            return {"success": False, "error": str(ex) or type(ex).__name__,
+                    "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}
+        return {"success": True, "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    async def _scheduler_stats(call: ServiceCall):
+        return hass.data[DOMAIN][DATA_SCHEDULER].stats
+
+    async def _set_switches(call: ServiceCall):
+        action = call.data[ATTR_ACTION]
+        if action == "trigger" and call.data.get(ATTR_OUTPUTS):
+            raise ServiceValidationError("Outputs can only be switched on or off")
+        started = time.monotonic()
+        # one flat fan-out over every device, bounded across the whole call
+        semaphore = asyncio.Semaphore(BULK_MAX_CONCURRENCY)
+        # resolve every device before the first action is created
+        devices = {device_id: _entry_data(hass, device_id) for device_id in call.data[ATTR_DEVICE_ID]}
+        targets = []  # (device id, target name, coroutine)
+        for device_id, data in devices.items():
+            device, coordinator = data["device"], data["coordinator"]
+            switches = call.data.get(ATTR_SWITCHES)
+            outputs = call.data.get(ATTR_OUTPUTS, [])
+            if switches is None and not outputs:
+                # no explicit targets: every enabled switch of the device
+                switches = [sw.id for sw in device.switches.values() if sw.enabled]
+            for switch_id in switches or []:
+                switch = device.switches.get(switch_id)
+                bistable = switch is not None and switch.mode == "bistable"
+                targets.append((device_id, f"switch_{switch_id}",
+                                coordinator.async_switch_ctrl(switch_id, action, bistable)))
+            for port in outputs:
+                targets.append((device_id, port, coordinator.async_output_ctrl(port, action == "on")))
+        results = await asyncio.gather(*(_timed(semaphore, coro) for _, _, coro in targets))
+        response = {}
+        for (device_id, name, _), result in zip(targets, results):
+            device_result = response.setdefault(device_id, {"results": {}})
+            device_result["results"][name] = result
+        for device_result in response.values():
+            device_result["success"] = all(r["success"] for r in device_result["results"].values())
+        return {
+            "success": all(r["success"] for r in results),
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+            "devices": response,
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SCHEDULER_STATS, _scheduler_stats,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_SWITCHES, _set_switches,
+        schema=SET_SWITCHES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,175 @@
+# snapshot.py
+import asyncio
+import os
+import time
+from contextlib import suppress
+import aiohttp
+from homeassistant.core import callback
+from .const import (
+    DOMAIN,
+    SNAPSHOT_DEFAULT_SIZE,
+    SNAPSHOT_KEEP,
+    SNAPSHOT_MAX_AGE,
+    SNAPSHOT_QUEUE_SIZE,
+)
+from .trace import get_logger
+
+_LOGGER = get_logger(__name__)
+
+class SnapshotCache:
+    def __init__(self, client, resolutions, max_age=SNAPSHOT_MAX_AGE):
+        self._client = client
+        # (width, height) pairs from camera/caps, smallest first
+        self._resolutions = sorted(set(resolutions), key=lambda r: r[0] * r[1])
+        self.max_age = max_age
+        self._frames = {}  # resolution -> (monotonic fetch start, jpeg bytes)
+        self._inflight = {}  # resolution -> (monotonic fetch start, task)
+
+    def resolution(self, width=None, height=None):
+        # smallest supported resolution covering the request, the largest otherwise
+        wanted = (width or SNAPSHOT_DEFAULT_SIZE[0], height or SNAPSHOT_DEFAULT_SIZE[1])
+        for resolution in self._resolutions:
+            if resolution[0] >= wanted[0] and resolution[1] >= wanted[1]:
+                return resolution
+        return self._resolutions[-1]
+
+    async def async_get(self, width=None, height=None, since=None):
+        # since: only accept a frame whose fetch started at or after this monotonic time
+        resolution = self.resolution(width, height)
+        oldest = time.monotonic() - self.max_age if since is None else since
+        frame = self._frames.get(resolution)
+        if frame is not None and frame[0] >= oldest:
+            return frame[1]
+        inflight = self._inflight.get(resolution)
+        if inflight is not None and since is not None and inflight[0] < since:
+            # started too early for this caller, let it finish and fetch anew
+            with suppress(Exception):
+                await asyncio.shield(inflight[1])
+            return await self.async_get(width, height, since)
+        if inflight is None:
+            started = time.monotonic()
+            task = asyncio.create_task(self._fetch(resolution, started))
+            task.add_done_callback(lambda t: self._finish(resolution, t))
+            inflight = self._inflight[resolution] = (started, task)
+        # viewers share the fetch, one going away must not cancel it for the rest
+        return await asyncio.shield(inflight[1])
+
+    def _finish(self, resolution, task):
+        self._inflight.pop(resolution, None)
+        if not task.cancelled() and task.exception() is not None:
+            _LOGGER.debug("Snapshot fetch failed for %s: %s", self._client.host, task.exception())
+
+    async def _fetch(self, resolution, started):
+        image = await self._client.snapshot(width=resolution[0], height=resolution[1])
+        if not isinstance(image, bytes):
+            # HAPI reports errors as JSON
+            _LOGGER.debug("Snapshot error from %s: %s", self._client.host, image)
+            return None
+        self._frames[resolution] = (started, image)
+        return image
+
+class SnapshotPipeline:
+    """Captures a snapshot for events of the selected types before they are fired.
+
+    Events wait in a bounded queue and one capture runs at a time, so an event
+    storm never puts more than one snapshot request on the intercom. When the
+    queue is full the oldest event is fired right away without an image.
+    Images are written to the media folder and the event carries the path.
+    """
+
+    def __init__(self, hass, snapshots, directory, event_types,
+                 queue_size=SNAPSHOT_QUEUE_SIZE, keep=SNAPSHOT_KEEP):
+        self.hass = hass
+        self.event_types = frozenset(event_types)
+        self._snapshots = snapshots
+        self._directory = directory
+        self._keep = keep
+        self._queue = asyncio.Queue(queue_size)
+        self._dispatch = None
+        self._task = None
+        self._current = None
+        # frames are shared for the cache's max age, so is the file
+        self._last_image = None
+        self._last_path = None
+        self.captured = 0
+        self.dropped = 0
+
+    @callback
+    def async_start(self, dispatch):
+        self._dispatch = dispatch
+        self._task = self.hass.async_create_background_task(
+            self._run(), f"{DOMAIN} snapshots {self._directory}"
+        )
+
+    async def async_stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # events are never lost, only their images
+        while not self._queue.empty():
+            self._dispatch(self._queue.get_nowait()[1])
+
+    @callback
+    def submit(self, event):
+        if self._queue.full():
+            self.dropped += 1
+            self._dispatch(self._queue.get_nowait()[1])
+        # the frame must be fetched after the event arrived, not served from the cache
+        self._queue.put_nowait((time.monotonic(), event))
+
+    async def _run(self):
+        while True:
+            arrived, self._current = await self._queue.get()
+            try:
+                path = await self._capture(self._current, arrived)
+            except asyncio.CancelledError:
+                self._dispatch(self._current)
+                raise
+            except Exception:
+                # one bad capture must not hold up the events behind it
+                _LOGGER.exception("Snapshot for %s failed", self._current.get("event"))
+                path = None
+            self._dispatch({**self._current, "snapshot": path})
+            self._current = None
+
+    async def _capture(self, event, arrived):
+        try:
+            image = await self._snapshots.async_get(since=arrived)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug("Snapshot for %s failed: %s", event.get("event"), ex)
+            return None
+        if image is None:
+            return None
+        if image is self._last_image:
+            return self._last_path
+        name = f"{event.get('utcTime', int(time.time()))}_{event.get('id', 0)}_{event.get('event')}.jpg"
+        try:
+            path = await self.hass.async_add_executor_job(self._write, name, image)
+        except OSError as ex:
+            _LOGGER.warning("Could not store snapshot in %s: %s", self._directory, ex)
+            return None
+        self._last_image, self._last_path = image, path
+        self.captured += 1
+        return path
+
+    def _write(self, name, image):
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, name)
+        with open(path, "wb") as f:
+            f.write(image)
+        # names start with the event time, oldest first
+        files = sorted(f for f in os.listdir(self._directory) if f.endswith(".jpg"))
+        for old in files[:-self._keep]:
+            with suppress(OSError):
+                os.remove(os.path.join(self._directory, old))
+        return path
+
+    def as_dict(self):
+        return {
+            "event_types": sorted(self.event_types),
+            "queued": self._queue.qsize(),
+            "captured": self.captured,
+            "dropped": self.dropped,
+        }
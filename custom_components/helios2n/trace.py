@@ -0,0 +1,94 @@
+# trace.py
+import logging
+import reprlib
+import time
+from collections import deque
+from .const import LOG_PAYLOAD_MAX, TRACE_BUFFER_SIZE
+
+# bounded repr: large payloads are cut short instead of stringified in full
+_REPR = reprlib.Repr()
+_REPR.maxlevel = 4
+_REPR.maxdict = 16
+_REPR.maxlist = 16
+_REPR.maxstring = LOG_PAYLOAD_MAX
+_REPR.maxother = LOG_PAYLOAD_MAX
+
+class Payload:
+    """Formats a payload only when a log record or trace actually needs it, bounded in size."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, (bytes, bytearray)):
+            return f"<{len(value)} bytes> {bytes(value[:LOG_PAYLOAD_MAX])!r}"
+        return _REPR.repr(value)
+
+    __repr__ = __str__
+
+def payload(value):
+    return Payload(value)
+
+class HapiLogger:
+    """Logger shared by all modules of the integration.
+
+    Arguments are only formatted by the logging module once a record is
+    emitted, so pass payloads wrapped in payload() and never pre-format them.
+    Messages on hot paths can be sampled with debug_sampled().
+    """
+    __slots__ = ("_logger", "_samples")
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(name)
+        self._samples = {}
+
+    def __getattr__(self, name):
+        # info, warning, error, isEnabledFor, ... as on the wrapped logger
+        return getattr(self._logger, name)
+
+    def debug(self, msg, *args, **kwargs):
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(msg, *args, stacklevel=2, **kwargs)
+
+    def debug_sampled(self, every, msg, *args):
+        # logs the first and then every n-th occurrence of msg
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        count = self._samples.get(msg, 0)
+        self._samples[msg] = count + 1
+        if count % every == 0:
+            self._logger.debug(f"{msg} (sampled 1/{every})", *args, stacklevel=2)
+
+def get_logger(name):
+    return HapiLogger(name)
+
+_LOGGER = get_logger(__name__)
+
+class DeviceTrace:
+    """Per device deep trace, switched on in the options.
+
+    While enabled, requests and pulled events are kept as bounded records in a
+    ring buffer that is part of the diagnostics download. Callers check
+    enabled before building a record, so a disabled trace costs one attribute
+    lookup.
+    """
+    __slots__ = ("host", "enabled", "_records")
+
+    def __init__(self, host, enabled=False, size=TRACE_BUFFER_SIZE):
+        self.host = host
+        self.enabled = enabled
+        self._records = deque(maxlen=size)
+
+    def record(self, kind, value=None, **fields):
+        if not self.enabled:
+            return
+        record = {"time": round(time.time(), 3), "kind": kind, **fields}
+        if value is not None:
+            record["payload"] = str(Payload(value))
+        self._records.append(record)
+        _LOGGER.debug("Trace %s %s: %s", self.host, kind, record)
+
+    def as_list(self):
+        return list(self._records)
@@ -0,0 +1,64 @@
+# test_smoke.py
+# End to end smoke test: LocalHapiClient and HapiCoordinator against the
+# bench simulator. Run from the repository root with python -m pytest.
+import asyncio
+import tempfile
+import time
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.core import CoreState, HomeAssistant
+from custom_components.helios2n.client import LocalHapiClient
+from custom_components.helios2n.coordinator import HapiCoordinator
+from custom_components.helios2n.scheduler import HapiScheduler
+from bench.simulator import SimulatedDevice
+
+
+async def _wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+async def _smoke(config_dir):
+    hass = HomeAssistant(config_dir)
+    hass.set_state(CoreState.running)
+    device = SimulatedDevice("SIM-TEST", event_rate=0)
+    await device.start()
+    client = LocalHapiClient(hass, device.host, "test", "test")
+    coordinator = HapiCoordinator(hass, client, HapiScheduler())
+    updates = []
+    # entities listen before the loop starts, so the first subscription carries their events
+    coordinator.async_add_listener(lambda: updates.append("input1"), ("port", "input1"))
+    coordinator.async_add_listener(lambda: updates.append("switch2"), ("switch", 2))
+    try:
+        await coordinator.async_start()
+        assert await _wait_for(lambda: device.subscriptions == 1, 5)
+
+        # a log event updates the state and notifies only that entity
+        device.ports["input1"]["state"] = 1
+        device.emit("InputChanged", {"port": "input1", "state": True})
+        assert await _wait_for(lambda: coordinator.ports.get("input1") is True, 5)
+        assert updates == ["input1"]
+
+        # a switch action is applied optimistically, then confirmed by its log event
+        await coordinator.async_switch_ctrl(2, "on", bistable=True)
+        assert coordinator.switches[2] is True
+        assert device.switches[2]["active"] is True
+        # confirmed well before CONFIRM_TIMEOUT would re-read the state
+        assert await _wait_for(lambda: not coordinator._pending, 3)
+        assert coordinator.switches[2] is True
+        assert client.available
+        assert client.metrics.events >= 2
+    finally:
+        await coordinator.async_stop()
+        await client.close()
+        await device.stop()
+    assert device.subscriptions == 0
+
+
+def test_subscribe_pull_and_confirm():
+    with tempfile.TemporaryDirectory() as config_dir:
+        asyncio.run(_smoke(config_dir))